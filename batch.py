@@ -0,0 +1,184 @@
+"""
+Headless batch mode: generates and narrates every premise in a JSONL file.
+
+    python batch.py premises.jsonl --out narrations --generation-workers 4 --synthesis-workers 2
+
+Each line is {"id": "...", "premise": "..."} (id is optional). Every item gets its
+own directory with story.txt, narration.wav (or the NARRATOR_OUTPUT_FORMAT
+extension), mapping.json and result.json. Items
+whose result.json exists are skipped, so an interrupted run can simply be restarted;
+an item whose story was generated but not yet narrated resumes at synthesis.
+Use --stub-llm and --fake-tts to run offline against the stand-ins in fakes.py.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from story_generator import client_for, generate_story, is_error
+
+def load_items(path):
+    items = []
+    # Output directories by name, casefolded for case-insensitive file systems.
+    dir_names = {}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("premise"):
+                raise ValueError(f"Error: line {line_number} of {path} has no premise.")
+            item_id = str(record.get("id", f"item-{line_number:05d}"))
+            dir_name = re.sub(r'[^A-Za-z0-9_.-]', '_', item_id)
+            other = dir_names.get(dir_name.casefold())
+            if other is not None:
+                raise ValueError(f"Error: line {line_number} of {path}: id {item_id!r} would share the output "
+                                 f"directory {dir_name!r} with id {other!r}.")
+            dir_names[dir_name.casefold()] = item_id
+            items.append({"id": item_id, "premise": record["premise"], "dir_name": dir_name})
+    return items
+
+def write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def generate_item(item, item_dir, fresh=False, model=None, workers=1):
+    """
+    Generates (or reloads) the story for an item. Returns (story, seconds spent).
+    workers is the number of generation workers sharing the Gemini client.
+    """
+    story_path = os.path.join(item_dir, "story.txt")
+    if os.path.exists(story_path):
+        with open(story_path, encoding="utf-8") as f:
+            return f.read(), 0.0
+    client_for(model).ensure_concurrency(workers)
+    start = time.perf_counter()
+    story = generate_story(item["premise"], fresh=fresh, model=model)
+    elapsed = time.perf_counter() - start
+    if not is_error(story):
+        os.makedirs(item_dir, exist_ok=True)
+        write_atomic(story_path, story)
+    return story, elapsed
+
+# Each synthesis process owns one narrator (and therefore one TTS engine).
+_batch_narrator = None
+
+def _init_batch_worker(engine_factory):
+    global _batch_narrator
+    from voice_generator import VoiceNarrator
+    if engine_factory is None:
+        _batch_narrator = VoiceNarrator(workers=1)
+    else:
+        _batch_narrator = VoiceNarrator(engine_factory=engine_factory, workers=1)
+
+def _narrate_item(item_dir, story):
+    """Narrates a story into item_dir. Returns (seconds spent, audio seconds, disk usage)."""
+    start = time.perf_counter()
+    final_file, mapping = _batch_narrator.save_to_temp_file(story)
+    audio_path = os.path.join(item_dir, "narration" + os.path.splitext(final_file)[1])
+    shutil.move(final_file, audio_path)
+    shutil.rmtree(os.path.dirname(final_file), ignore_errors=True)
+    write_atomic(os.path.join(item_dir, "mapping.json"), json.dumps(mapping, indent=2))
+    elapsed = time.perf_counter() - start
+    usage = dict(_batch_narrator.last_usage)
+    return elapsed, usage.pop("audio_ms") / 1000, usage
+
+def run_batch(items, out_dir, generation_workers=4, synthesis_workers=1, fresh=False, model=None, engine_factory=None):
+    """Runs the pipeline over items and returns the result records of the items completed."""
+    results = []
+    failures = 0
+    pending = [item for item in items
+               if not os.path.exists(os.path.join(out_dir, item["dir_name"], "result.json"))]
+    if len(pending) < len(items):
+        print(f"Skipping {len(items) - len(pending)} completed item(s).")
+
+    with ThreadPoolExecutor(generation_workers) as generation_pool, \
+            ProcessPoolExecutor(synthesis_workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_batch_worker, initargs=(engine_factory,)) as synthesis_pool:
+        labels = {}
+        for item in pending:
+            item_dir = os.path.join(out_dir, item["dir_name"])
+            future = generation_pool.submit(generate_item, item, item_dir, fresh, model, generation_workers)
+            labels[future] = ("generate", item, item_dir, None)
+        running = set(labels)
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, item, item_dir, generation_seconds = labels.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"[{item['id']}] failed during {stage}: {e}")
+                    continue
+                if stage == "generate":
+                    story, generation_seconds = outcome
+                    if is_error(story):
+                        failures += 1
+                        print(f"[{item['id']}] {story}")
+                        continue
+                    # Synthesis starts as soon as this story is ready, not after the whole batch.
+                    next_future = synthesis_pool.submit(_narrate_item, item_dir, story)
+                    labels[next_future] = ("synthesize", item, item_dir, (generation_seconds, story))
+                    running.add(next_future)
+                    continue
+                generation_seconds, story = generation_seconds
+                synthesis_seconds, audio_seconds, usage = outcome
+                result = {
+                    "id": item["id"],
+                    "premise": item["premise"],
+                    "words": len(story.split()),
+                    "generation_seconds": round(generation_seconds, 3),
+                    "synthesis_seconds": round(synthesis_seconds, 3),
+                    "audio_seconds": round(audio_seconds, 3),
+                    **usage,
+                }
+                write_atomic(os.path.join(item_dir, "result.json"), json.dumps(result, indent=2))
+                results.append(result)
+                print(f"[{item['id']}] {result['words']} words, generated in {generation_seconds:.2f} s, "
+                      f"narrated in {synthesis_seconds:.2f} s ({audio_seconds:.1f} s of audio, "
+                      f"{audio_seconds / max(synthesis_seconds, 1e-9):.1f}x realtime)")
+    return results, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("premises", help="JSONL file with one {\"id\", \"premise\"} object per line")
+    parser.add_argument("--out", default="narrations", help="output directory (default: narrations)")
+    parser.add_argument("--generation-workers", type=int, default=4, help="concurrent story generations")
+    parser.add_argument("--synthesis-workers", type=int, default=1, help="concurrent narration processes")
+    parser.add_argument("--fresh", action="store_true", help="bypass the story generation cache")
+    parser.add_argument("--stub-llm", action="store_true", help="use the local fake model instead of Gemini")
+    parser.add_argument("--fake-tts", action="store_true", help="use the fake TTS engine instead of pyttsx3")
+    args = parser.parse_args()
+
+    model = engine_factory = None
+    if args.stub_llm:
+        from fakes import FakeStreamingModel
+        model = FakeStreamingModel()
+    if args.fake_tts:
+        from fakes import fake_engine
+        engine_factory = fake_engine
+
+    items = load_items(args.premises)
+    os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+    results, failures = run_batch(items, args.out, args.generation_workers, args.synthesis_workers,
+                                  args.fresh, model, engine_factory)
+    elapsed = time.perf_counter() - start
+
+    words = sum(result["words"] for result in results)
+    audio_seconds = sum(result["audio_seconds"] for result in results)
+    print(f"Completed {len(results)} item(s), {failures} failed, in {elapsed:.2f} s: "
+          f"{len(results) / elapsed * 60:.1f} items/min, {words / elapsed:.0f} words/s, "
+          f"{audio_seconds / elapsed:.1f} s of audio per second.")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,748 @@
+"""
+Benchmarks for the narration pipeline, run against the local stand-ins in fakes.py
+so no TTS engine or API key is needed.
+
+    python benchmark.py parallel --segments 4 16 64 --workers 1 2 4
+    python benchmark.py assembly --words 10000 20000
+    python benchmark.py cache --segments 32
+    python benchmark.py cues --megabytes 5
+    python benchmark.py client --requests 8 [--live]
+    python benchmark.py startup [--fake-tts]
+    python benchmark.py workspace --formats wav flac mp3
+    python benchmark.py dsp --seconds 30 --sample-rate 22050
+    python benchmark.py schedule --words 800 5000 --call-cost 0.15
+    python benchmark.py suite --sizes 500 2000 10000 50000 --output bench.json [--baseline old.json]
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import re
+import random
+import warnings
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+from fakes import fake_engine, tone_frames, FakeTTSEngine
+
+WORDS = (
+    "the old castle stood silently on the hill its ancient stones gleaming in the "
+    "moonlight alice approached the heavy wooden door and called out nervously"
+).split()
+
+
+def synthetic_story(segment_count, words_per_segment):
+    """A story of segment_count scenes separated by [SCENE CHANGE] cues."""
+    scenes = []
+    for i in range(segment_count):
+        words = [WORDS[(i + n) % len(WORDS)] for n in range(words_per_segment)]
+        scenes.append(" ".join(words).capitalize() + ".")
+    return " [SCENE CHANGE] ".join(scenes)
+
+
+def bench_parallel(args):
+    from voice_generator import VoiceNarrator
+
+    # Pool and engine startup is paid once per narrator (see VoiceNarrator.warm_up), so
+    # it is reported on its own and the speedup compares render times only. The fake
+    # engine burns CPU, so the speedup is bounded by the number of cores.
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'segments':>8} {'workers':>7} {'startup':>8} {'seconds':>8} {'speedup':>7}")
+    for segment_count in args.segments:
+        text = synthetic_story(segment_count, args.words_per_segment)
+        serial_time = None
+        for workers in args.workers:
+            narrator = VoiceNarrator(engine_factory=fake_engine, workers=workers, cache=False)
+            start = time.perf_counter()
+            narrator.warm_up()
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            narrator.save_to_temp_file(text)
+            elapsed = time.perf_counter() - start
+            narrator.close()
+            if serial_time is None:
+                serial_time = elapsed
+            print(f"{segment_count:>8} {workers:>7} {startup:>8.3f} {elapsed:>8.3f} {serial_time / elapsed:>6.2f}x")
+
+
+def legacy_assemble(segment_files, pauses, temp_dir):
+    """The assembly step of save_to_temp_file before WavAssembler, kept for comparison."""
+    from pydub import AudioSegment
+
+    files = []
+    mapping = []
+    current_time = 0
+    for i, (seg_file, pause_after) in enumerate(zip(segment_files, pauses)):
+        seg_duration = len(AudioSegment.from_file(seg_file))
+        mapping.append({"start_time": current_time, "end_time": current_time + seg_duration})
+        current_time += seg_duration
+        files.append(seg_file)
+        if pause_after > 0:
+            silence = AudioSegment.silent(duration=pause_after)
+            silence_file = os.path.join(temp_dir, f"silence_{i}.wav")
+            silence.export(silence_file, format="wav")
+            files.append(silence_file)
+            current_time += pause_after
+    final_audio = AudioSegment.empty()
+    for file in files:
+        final_audio += AudioSegment.from_file(file)
+    final_file = os.path.join(temp_dir, "final_narration.wav")
+    final_audio.export(final_file, format="wav")
+    return final_file, mapping
+
+
+def streaming_assemble(segment_files, pauses, temp_dir):
+    from voice_generator import WavAssembler
+
+    mapping = []
+    current_time = 0
+    final_file = os.path.join(temp_dir, "final_narration.wav")
+    with WavAssembler(final_file) as assembler:
+        for seg_file, pause_after in zip(segment_files, pauses):
+            seg_duration = assembler.duration_ms(assembler.add_file(seg_file))
+            mapping.append({"start_time": current_time, "end_time": current_time + seg_duration})
+            current_time += seg_duration
+            if pause_after > 0:
+                assembler.add_silence(pause_after)
+                current_time += pause_after
+    return final_file, mapping
+
+
+ASSEMBLERS = {"legacy": legacy_assemble, "streaming": streaming_assemble}
+
+
+def write_segment_files(directory, words, words_per_segment, rate=175):
+    """Renders a synthetic story of the given length as fake-engine segment WAVs."""
+    segment_files = []
+    pauses = []
+    for i in range(-(-words // words_per_segment)):
+        seg_words = min(words_per_segment, words - i * words_per_segment)
+        frame_count = int(seg_words * 60.0 / rate * FakeTTSEngine.sample_rate)
+        seg_file = os.path.join(directory, f"segment_{i}.wav")
+        with wave.open(seg_file, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(FakeTTSEngine.sample_rate)
+            out.writeframes(tone_frames(frame_count))
+        segment_files.append(seg_file)
+        pauses.append(500 if i % 3 == 0 else 0)
+    return segment_files, pauses
+
+
+def bench_assembly_run(args):
+    """Runs one assembler in this process and prints its time and peak RSS as JSON."""
+    with open(os.path.join(args.dir, "segments.json")) as f:
+        segment_files, pauses = json.load(f)
+    out_dir = tempfile.mkdtemp(dir=args.dir)
+    start = time.perf_counter()
+    ASSEMBLERS[args.engine](segment_files, pauses, out_dir)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    shutil.rmtree(out_dir)
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_kb / 1024}))
+
+
+def bench_assembly(args):
+    # Each assembler runs in a fresh interpreter so peak RSS is measured in isolation.
+    print(f"{'words':>7} {'segments':>8} {'engine':>9} {'seconds':>8} {'peak RSS MB':>11}")
+    for words in args.words:
+        directory = tempfile.mkdtemp()
+        try:
+            segment_files, pauses = write_segment_files(directory, words, args.words_per_segment)
+            with open(os.path.join(directory, "segments.json"), "w") as f:
+                json.dump([segment_files, pauses], f)
+            for engine in ASSEMBLERS:
+                output = subprocess.run(
+                    [sys.executable, __file__, "assembly-run", "--engine", engine, "--dir", directory],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output)
+                print(f"{words:>7} {len(segment_files):>8} {engine:>9} "
+                      f"{result['seconds']:>8.3f} {result['peak_rss_mb']:>11.1f}")
+        finally:
+            shutil.rmtree(directory)
+
+
+def bench_cache(args):
+    from voice_generator import VoiceNarrator
+    from segment_cache import SegmentCache
+
+    directory = tempfile.mkdtemp()
+    try:
+        cache = SegmentCache(directory)
+        narrator = VoiceNarrator(engine_factory=fake_engine, workers=1, cache=cache)
+        text = synthetic_story(args.segments, args.words_per_segment)
+        print(f"{'run':>6} {'seconds':>8} {'hits':>5} {'misses':>6}")
+        for run in ("cold", "warm"):
+            hits, misses = cache.hits, cache.misses
+            start = time.perf_counter()
+            narrator.save_to_temp_file(text)
+            elapsed = time.perf_counter() - start
+            print(f"{run:>6} {elapsed:>8.3f} {cache.hits - hits:>5} {cache.misses - misses:>6}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_workspace(args):
+    """Bytes left on disk per story before (a bare temp dir) and after the workspace, per output format."""
+    from voice_generator import VoiceNarrator
+    from workspace import Workspace, directory_size, format_bytes
+
+    text = synthetic_story(args.segments, args.words_per_segment)
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"{'output':>10} {'seconds':>8} {'written':>10} {'kept':>10}")
+        narrator = VoiceNarrator(engine_factory=fake_engine, workers=1, cache=False, workspace=False)
+        start = time.perf_counter()
+        final_file, _ = narrator.save_to_temp_file(text)
+        elapsed = time.perf_counter() - start
+        written = directory_size(os.path.dirname(final_file))
+        shutil.rmtree(os.path.dirname(final_file))
+        print(f"{'temp dir':>10} {elapsed:>8.3f} {format_bytes(written):>10} {format_bytes(written):>10}")
+        for output_format in args.formats:
+            workspace = Workspace(os.path.join(directory, output_format), output_format=output_format)
+            narrator = VoiceNarrator(engine_factory=fake_engine, workers=1, cache=False, workspace=workspace)
+            start = time.perf_counter()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                narrator.save_to_temp_file(text)
+            elapsed = time.perf_counter() - start
+            usage = narrator.last_usage
+            note = "  (encoder unavailable, kept WAV)" if caught else ""
+            print(f"{output_format:>10} {elapsed:>8.3f} {format_bytes(usage['bytes_written']):>10} "
+                  f"{format_bytes(usage['bytes_kept']):>10}{note}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def legacy_parse(text, default_rate=175, default_volume=0.8, default_pitch=100):
+    """parse_modulation_instructions before the cue compiler, kept as the golden reference."""
+    segments = []
+    current_text = ""
+    current_properties = {
+        'rate': default_rate,
+        'volume': default_volume,
+        'pitch': default_pitch,
+        'pause_before': 0,
+        'pause_after': 0
+    }
+    pattern = r'\[([^\]]+)\]'
+    parts = re.split(pattern, text)
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            current_text += part
+        else:
+            instruction = part.strip().upper()
+            if instruction in ("SOFT TONE", "SOFT REFLECTIVE TONE"):
+                current_properties['volume'] = 0.7
+                current_properties['rate'] = default_rate - 20
+            elif instruction == "SLOWER PACE":
+                current_properties['rate'] = default_rate - 30
+            elif instruction in ("FASTER PACE", "INCREASE PACE"):
+                current_properties['rate'] = default_rate + 30
+            elif instruction == "ENERGETIC TONE":
+                current_properties['volume'] = 0.9
+                current_properties['pitch'] = 110
+            elif instruction in ("INCREASED VOLUME", "INCREASE VOLUME"):
+                current_properties['volume'] = 0.95
+            elif instruction == "EMPHASIS":
+                current_properties['pitch'] = 110
+            elif instruction in ("BRIEF PAUSE", "PAUSE"):
+                current_properties['pause_after'] = 500  # 500 ms
+            elif instruction == "PAUSE BRIEFLY":
+                current_properties['pause_before'] = 300  # 300 ms
+            elif instruction == "PAUSE LONGER":
+                current_properties['pause_after'] = 1000  # 1 sec
+            elif instruction == "RISING INTONATION":
+                current_properties['pitch'] = 115
+            elif instruction == "TENSE TREMBLING TONE":
+                current_properties['rate'] = default_rate - 10
+                current_properties['pitch'] = 105
+            elif instruction == "BRIGHT UPLIFTED TONE":
+                current_properties['rate'] = default_rate + 10
+                current_properties['pitch'] = 110
+                current_properties['volume'] = 0.85
+            elif instruction == "SOMBER HEAVY TONE":
+                current_properties['rate'] = default_rate - 20
+                current_properties['pitch'] = 90
+                current_properties['volume'] = 0.75
+            elif instruction == "SHARP INTENSE TONE":
+                current_properties['rate'] = default_rate + 15
+                current_properties['pitch'] = 105
+                current_properties['volume'] = 0.9
+            elif instruction in ("DIALOGUE VOICE", "CONVERSATIONAL TONE"):
+                current_properties['pitch'] = 105
+                current_properties['rate'] = default_rate + 5
+            elif instruction == "EMOTIVE":
+                current_properties['volume'] = min(current_properties['volume'] + 0.1, 1.0)
+                current_properties['pitch'] += 5
+            elif instruction == "NATURAL":
+                current_properties['rate'] = default_rate
+            elif instruction == "THRILLING":
+                current_properties['volume'] = 0.95
+                current_properties['pitch'] += 10
+            elif instruction in ("SCENE CHANGE", "SHIFT TONE"):
+                if current_text:
+                    # Append current segment
+                    segments.append((current_text.strip(), dict(current_properties)))
+                    current_text = ""
+                # Reset properties for new segment with a pause before
+                current_properties = {
+                    'rate': default_rate,
+                    'volume': default_volume,
+                    'pitch': default_pitch,
+                    'pause_before': 1000,
+                    'pause_after': 0
+                }
+    if current_text:
+        segments.append((current_text.strip(), dict(current_properties)))
+    return segments
+
+
+def golden_corpus(seed=7, count=200):
+    """Cue-annotated texts covering every cue, aliases, odd casing/spacing and malformed brackets."""
+    from fakes import SAMPLE_STORY
+    from cue_compiler import load_cue_table
+
+    names = [name for entry in load_cue_table() for name in entry["names"]]
+    oddities = ["[]", "[[PAUSE]]", "[PAUSE", "]", "[ unknown cue ]", "[TONE: Eerie]", "[PARAGRAPH]"]
+    rng = random.Random(seed)
+    corpus = [SAMPLE_STORY, "", "no cues at all", "[SCENE CHANGE]", "[SCENE CHANGE] [SHIFT TONE] x",
+              "[EMOTIVE]" * 12 + " loud", "  [PAUSE]  "]
+    for _ in range(count):
+        tokens = []
+        for _ in range(rng.randint(1, 40)):
+            roll = rng.random()
+            if roll < 0.45:
+                name = rng.choice(names)
+                name = rng.choice([name, name.lower(), name.title()])
+                tokens.append("[" + " " * rng.randint(0, 2) + name + " " * rng.randint(0, 2) + "]")
+            elif roll < 0.5:
+                tokens.append(rng.choice(oddities))
+            else:
+                tokens.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))) + rng.choice([".", "!", "", "\n"]))
+        corpus.append(rng.choice([" ", "", "  "]).join(tokens))
+    return corpus
+
+
+def bench_cues(args):
+    from cue_compiler import CueCompiler
+
+    defaults = {'rate': 175, 'volume': 0.8, 'pitch': 100, 'pause_before': 0, 'pause_after': 0}
+    compiler = CueCompiler(defaults)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        corpus = golden_corpus()
+        mismatches = [text for text in corpus if compiler.parse(text)[0] != legacy_parse(text)]
+        print(f"golden corpus: {len(corpus) - len(mismatches)}/{len(corpus)} texts identical")
+        for text in mismatches[:3]:
+            print("  mismatch:", repr(text[:120]))
+
+        block = "".join(corpus)
+        text = block * max(1, int(args.megabytes * 1024 * 1024 / len(block)))
+        cue_count = len(re.findall(r'\[([^\]]+)\]', text))
+        megabytes = len(text) / (1024 * 1024)
+        print(f"{'parser':>9} {'seconds':>8} {'MB/s':>7} {'cues/s':>10}")
+        for name, parse in (("legacy", legacy_parse), ("compiler", lambda t: compiler.parse(t)[0])):
+            start = time.perf_counter()
+            parse(text)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>9} {elapsed:>8.3f} {megabytes / elapsed:>7.1f} {cue_count / elapsed:>10.0f}")
+    if mismatches:
+        sys.exit(1)
+
+
+def bench_dsp(args):
+    """
+    Throughput of the DSP modulation stage in samples per second on one core, and
+    the engine calls needed to narrate a story again with different cues.
+    """
+    import dsp
+    from voice_generator import VoiceNarrator
+    from segment_cache import SegmentCache
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+    params = (1, 2, args.sample_rate)
+    frame_count = int(args.seconds * args.sample_rate)
+    frames = tone_frames(frame_count, 0.8, 100, args.sample_rate)
+    operations = [
+        ("gain 1.2", {"gain": 1.2}),
+        ("tempo 0.85", {"stretch": 0.85}),
+        ("tempo 1.20", {"stretch": 1.2}),
+        ("pitch 1.10", {"pitch": 1.1}),
+        ("pitch 0.90", {"pitch": 0.9}),
+        ("all three", {"stretch": 175 / 190, "pitch": 1.1, "gain": 0.9 / 0.8}),
+    ]
+    print(f"{args.seconds:g} s of 16-bit mono audio at {args.sample_rate} Hz, best of {args.repeat}, one core")
+    print(f"{'operation':>12} {'seconds':>8} {'Msamples/s':>11} {'x realtime':>11}")
+    for name, modulation in operations:
+        elapsed, _ = time_best(lambda: dsp.modulate(frames, params, **modulation), args.repeat)
+        print(f"{name:>12} {elapsed:>8.4f} {frame_count / elapsed / 1e6:>11.2f} {args.seconds / elapsed:>11.0f}")
+
+    # Sentence-by-sentence narration, then the same text with every cue swapped.
+    rng = random.Random(5)
+    names = ["SOFT REFLECTIVE TONE", "FASTER PACE", "SLOWER PACE", "ENERGETIC TONE", "EMPHASIS",
+             "SOMBER HEAVY TONE", "CONVERSATIONAL TONE", "THRILLING"]
+    sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))) + "." for _ in range(args.sentences)]
+    first = [f"[{rng.choice(names)}] {sentence} " for sentence in sentences]
+    second = [f"[{rng.choice(names)}] {sentence} " for sentence in sentences]
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"\n{'modulation':>10} {'first run':>10} {'re-cued run':>12}  (engine calls for {args.sentences} sentences)")
+        for mode in ("engine", "dsp"):
+            cache = SegmentCache(os.path.join(directory, mode))
+            narrator = VoiceNarrator(engine_factory=fake_engine, workers=1, cache=cache, workspace=False,
+                                     modulation=mode)
+            calls = []
+            for pieces in (first, second):
+                misses = cache.misses
+                narrator.save_stream_to_temp_file(iter(pieces))
+                calls.append(cache.misses - misses)
+            print(f"{mode:>10} {calls[0]:>10} {calls[1]:>12}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_client(args):
+    """Per-request latency and prompt tokens: generate_text(enhance_prompt(...)) vs. GeminiClient."""
+    import asyncio
+    import statistics
+    from story_generator import enhance_prompt, premise_prompt, generate_text, GeminiClient, get_client, MODEL_NAME
+
+    premises = [f"A lighthouse keeper finds message number {i} in a bottle" for i in range(args.requests)]
+    if args.live:
+        import google.generativeai as genai
+        legacy = lambda prompt: generate_text(prompt)
+        client = get_client()
+        counter = genai.GenerativeModel(MODEL_NAME)
+    else:
+        from fakes import FakeStreamingModel
+        model = FakeStreamingModel(first_chunk_latency=args.latency, chunk_latency=0)
+        legacy = lambda prompt: generate_text(prompt, model=model)
+        client = GeminiClient(model=model, max_concurrency=args.concurrency)
+        counter = model
+
+    legacy_times = []
+    for premise in premises:
+        start = time.perf_counter()
+        legacy(enhance_prompt(premise))
+        legacy_times.append(time.perf_counter() - start)
+    client_times = []
+    for premise in premises:
+        start = time.perf_counter()
+        client.generate_sync(premise)
+        client_times.append(time.perf_counter() - start)
+
+    async def concurrent():
+        start = time.perf_counter()
+        await asyncio.gather(*(client.generate(premise) for premise in premises))
+        return time.perf_counter() - start
+    concurrent_time = asyncio.run(concurrent())
+
+    legacy_tokens = statistics.mean(counter.count_tokens(enhance_prompt(p)).total_tokens for p in premises)
+    client_tokens = statistics.mean(counter.count_tokens(premise_prompt(p)).total_tokens for p in premises)
+    print(f"{'path':>22} {'p50 s':>7} {'max s':>7} {'prompt tokens':>13}")
+    print(f"{'generate_text':>22} {statistics.median(legacy_times):>7.3f} {max(legacy_times):>7.3f} {legacy_tokens:>13.0f}")
+    print(f"{'GeminiClient':>22} {statistics.median(client_times):>7.3f} {max(client_times):>7.3f} {client_tokens:>13.0f}")
+    print(f"{len(premises)} concurrent requests through GeminiClient took {concurrent_time:.3f} s "
+          f"(max {client.max_concurrency} in flight)")
+
+
+def bench_startup(args):
+    """Import cost of the app's modules and per-story narrator setup, cold vs. shared."""
+    print(f"{'import':>24} {'seconds':>8}")
+    for module in ("story_generator", "google.generativeai", "voice_generator", "PyQt6.QtMultimedia"):
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        seconds = f"{float(result.stdout):>8.3f}" if result.returncode == 0 else f"{'n/a':>8}"
+        print(f"{module:>24} {seconds}")
+
+    import voice_generator
+    from voice_generator import VoiceNarrator
+    factory = fake_engine if args.fake_tts else voice_generator.pyttsx3.init
+    cold = []
+    for _ in range(args.stories):
+        start = time.perf_counter()
+        VoiceNarrator(engine_factory=factory, workers=1, cache=False)
+        cold.append(time.perf_counter() - start)
+    voice_generator._shared_narrator = VoiceNarrator(engine_factory=factory, workers=1, cache=False)
+    warm = []
+    for _ in range(args.stories):
+        start = time.perf_counter()
+        voice_generator.get_shared_narrator()
+        warm.append(time.perf_counter() - start)
+    print(f"per-story narrator setup: new VoiceNarrator {sum(cold) / len(cold) * 1000:.2f} ms, "
+          f"shared narrator {sum(warm) / len(warm) * 1000:.4f} ms")
+
+
+STORY_CUES = ["SOFT REFLECTIVE TONE", "CONVERSATIONAL TONE", "FASTER PACE", "ENERGETIC TONE", "EMOTIVE",
+              "NATURAL", "THRILLING", "TENSE TREMBLING TONE", "SLOWER PACE", "PAUSE", "PAUSE LONGER"]
+
+
+def synthetic_cued_story(words, seed=11):
+    """A Gemini-like story: short sentences, a cue every couple of sentences, a scene change every ~150 words."""
+    rng = random.Random(seed)
+    out = []
+    written = since_scene = 0
+    while written < words:
+        if since_scene >= 150:
+            out.append("\n\n[SCENE CHANGE] ")
+            since_scene = 0
+        if rng.random() < 0.5:
+            out.append(f"[{rng.choice(STORY_CUES)}] ")
+        length = min(rng.randint(8, 20), words - written)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        out.append(sentence.capitalize() + rng.choice([". ", "! ", "? "]))
+        written += length
+        since_scene += length
+    return "".join(out)
+
+
+def time_best(function, repeat):
+    """Runs function repeat times; returns (best seconds, last result)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def suite_story_worker(text, narrator, args):
+    """The streaming StoryWorker -> NarrationWorker flow against the fake model, run synchronously."""
+    import threading
+    from PyQt6.QtCore import QCoreApplication
+    from main import StoryWorker, NarrationWorker
+    from fakes import FakeStreamingModel
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    model = FakeStreamingModel(story=text, chunk_size=args.chunk_size,
+                               first_chunk_latency=args.llm_latency, chunk_latency=args.chunk_latency)
+    story_worker = StoryWorker("benchmark premise", stream=True, model=model, fresh=True)
+    narration_worker = NarrationWorker(narrator)
+    story_worker.segment_ready.connect(narration_worker.enqueue)
+    story_worker.story_generated.connect(lambda *_: narration_worker.finish())
+    start = time.perf_counter()
+    narration = threading.Thread(target=narration_worker.run)
+    narration.start()
+    story_worker.run()
+    narration.join()
+    return {
+        "seconds": time.perf_counter() - start,
+        "time_to_first_word": story_worker.first_word_time,
+        "time_to_first_audio": narration_worker.first_audio_time,
+    }
+
+
+def bench_schedule(args):
+    """Engine calls, wall time and time to first audio per story without and with the segment scheduler."""
+    from voice_generator import VoiceNarrator
+    from story_generator import SegmentSplitter
+
+    engine_factory = functools.partial(FakeTTSEngine, synthesis_cost=args.tts_cost, sample_rate=8000,
+                                       call_cost=args.call_cost)
+    print(f"fake engine: {args.call_cost * 1000:.0f} ms per call + {args.tts_cost * 1000:.1f} ms per word, "
+          f"{args.workers} worker(s)")
+    print(f"{'words':>6} {'path':>7} {'scheduler':>10} {'segments':>9} {'engine calls':>13} {'seconds':>8} "
+          f"{'first audio s':>14}")
+    for words in args.words:
+        text = synthetic_cued_story(words)
+        splitter = SegmentSplitter()
+        pieces = splitter.feed(text) + splitter.flush()
+        # Sentence pieces, as the streaming StoryWorker hands them to the narrator.
+        pieces = [piece for chunk in pieces for piece in re.split(r'(?<=[.!?] )', chunk) if piece]
+        for path in ("batch", "stream"):
+            for scheduler in (False, None):
+                narrator = VoiceNarrator(engine_factory=engine_factory, workers=args.workers, cache=False,
+                                         workspace=False, scheduler=scheduler)
+                narrator.warm_up()
+                first_audio = []
+                start = time.perf_counter()
+                if path == "batch":
+                    final_file, mapping = narrator.save_to_temp_file(text)
+                else:
+                    final_file, mapping = narrator.save_stream_to_temp_file(
+                        iter(pieces), lambda *_: first_audio.append(time.perf_counter() - start))
+                elapsed = time.perf_counter() - start
+                narrator.close()
+                shutil.rmtree(os.path.dirname(final_file))
+                first = f"{first_audio[0]:>14.3f}" if first_audio else f"{'-':>14}"
+                name = "off" if scheduler is False else "on"
+                print(f"{words:>6} {path:>7} {name:>10} {len(mapping):>9} {narrator.last_usage['engine_calls']:>13} "
+                      f"{elapsed:>8.3f} {first}")
+
+
+def bench_suite(args):
+    """Times every pipeline stage across story sizes and writes the results as JSON."""
+    from voice_generator import VoiceNarrator, WavAssembler
+    from fakes import FakeTTSEngine
+
+    engine_factory = functools.partial(FakeTTSEngine, synthesis_cost=args.tts_cost, sample_rate=args.sample_rate)
+    narrator = VoiceNarrator(engine_factory=engine_factory, workers=args.workers, cache=False)
+    results = []
+
+    def record(words, stage, seconds, **extra):
+        results.append({"words": words, "stage": stage, "seconds": round(seconds, 6), **extra})
+        details = " ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in extra.items())
+        print(f"{words:>6} words  {stage:<18} {seconds:>9.3f} s  {details}")
+
+    for words in args.sizes:
+        text = synthetic_cued_story(words)
+        seconds, segments = time_best(lambda: narrator.parse_modulation_instructions(text), args.repeat)
+        record(words, "parse", seconds, segments=len(segments))
+
+        pieces = [piece for piece in re.split(r'(?<=[.!?] )', text) if piece]
+        stream_segments = list(narrator.parse_modulation_stream(pieces))
+        temp_dir = tempfile.mkdtemp()
+        try:
+            seconds, rendered = time_best(lambda: list(narrator._render_serial(stream_segments, temp_dir)), 1)
+            record(words, "synthesis", seconds, segments=len(rendered))
+
+            def assemble():
+                with WavAssembler(os.path.join(temp_dir, "final_narration.wav")) as assembler:
+                    for _, _, properties, seg_file in rendered:
+                        assembler.add_file(seg_file)
+                        if properties['pause_after'] > 0:
+                            assembler.add_silence(properties['pause_after'])
+                    return assembler
+            seconds, _ = time_best(assemble, args.repeat)
+            record(words, "assembly", seconds)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        seconds, (final_file, mapping) = time_best(lambda: narrator.save_to_temp_file(text), 1)
+        shutil.rmtree(os.path.dirname(final_file))
+        record(words, "save_to_temp_file", seconds, audio_seconds=mapping[-1]["end_time"] / 1000 if mapping else 0.0)
+
+        try:
+            flow = suite_story_worker(text, narrator, args)
+        except ImportError as e:
+            print(f"{words:>6} words  story_worker       skipped ({e})")
+            continue
+        record(words, "story_worker", flow.pop("seconds"), **flow)
+    narrator.close()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "options": {key: value for key, value in vars(args).items() if key != "func"},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline and compare_to_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Prints stages that got slower than the baseline by more than tolerance; returns True if any did."""
+    with open(baseline_path) as f:
+        baseline = {(row["words"], row["stage"]): row["seconds"] for row in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        before = baseline.get((row["words"], row["stage"]))
+        if before and row["seconds"] > before * (1 + tolerance):
+            regressions.append((row, before))
+    for row, before in regressions:
+        print(f"REGRESSION {row['words']} words {row['stage']}: {before:.3f} s -> {row['seconds']:.3f} s")
+    if not regressions:
+        print(f"No stage regressed by more than {tolerance:.0%} against {baseline_path}.")
+    return bool(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parallel = subparsers.add_parser("parallel", help="wall-clock time of serial vs. pooled segment synthesis")
+    parallel.add_argument("--segments", type=int, nargs="+", default=[4, 16, 64])
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parallel.add_argument("--words-per-segment", type=int, default=60)
+    parallel.set_defaults(func=bench_parallel)
+
+    assembly = subparsers.add_parser("assembly", help="time and peak RSS of legacy vs. streaming audio assembly")
+    assembly.add_argument("--words", type=int, nargs="+", default=[10000, 20000])
+    assembly.add_argument("--words-per-segment", type=int, default=50)
+    assembly.set_defaults(func=bench_assembly)
+
+    assembly_run = subparsers.add_parser("assembly-run")
+    assembly_run.add_argument("--engine", choices=sorted(ASSEMBLERS), required=True)
+    assembly_run.add_argument("--dir", required=True)
+    assembly_run.set_defaults(func=bench_assembly_run)
+
+    cache = subparsers.add_parser("cache", help="narration time with a cold vs. warm segment cache")
+    cache.add_argument("--segments", type=int, default=32)
+    cache.add_argument("--words-per-segment", type=int, default=60)
+    cache.set_defaults(func=bench_cache)
+
+    workspace = subparsers.add_parser("workspace", help="bytes written and kept per story, per output format")
+    workspace.add_argument("--segments", type=int, default=40)
+    workspace.add_argument("--words-per-segment", type=int, default=30)
+    workspace.add_argument("--formats", nargs="+", default=["wav", "flac", "mp3"])
+    workspace.set_defaults(func=bench_workspace)
+
+    cues = subparsers.add_parser("cues", help="golden-corpus check and throughput of the cue compiler")
+    cues.add_argument("--megabytes", type=float, default=5)
+    cues.set_defaults(func=bench_cues)
+
+    client = subparsers.add_parser("client", help="latency and prompt tokens before/after GeminiClient")
+    client.add_argument("--requests", type=int, default=8)
+    client.add_argument("--concurrency", type=int, default=4)
+    client.add_argument("--latency", type=float, default=0.3, help="fake model latency in seconds")
+    client.add_argument("--live", action="store_true", help="call the real Gemini API (needs GEMINI_API_KEY)")
+    client.set_defaults(func=bench_client)
+
+    startup = subparsers.add_parser("startup", help="module import cost and per-story narrator setup")
+    startup.add_argument("--stories", type=int, default=5)
+    startup.add_argument("--fake-tts", action="store_true", help="use the fake TTS engine instead of pyttsx3")
+    startup.set_defaults(func=bench_startup)
+
+    dsp = subparsers.add_parser("dsp", help="samples/s per core of the DSP modulation stage")
+    dsp.add_argument("--seconds", type=float, default=30, help="length of the audio processed per operation")
+    dsp.add_argument("--sample-rate", type=int, default=22050)
+    dsp.add_argument("--repeat", type=int, default=5, help="repetitions per operation (best is kept)")
+    dsp.add_argument("--sentences", type=int, default=40, help="sentences in the re-cued narration")
+    dsp.set_defaults(func=bench_dsp)
+
+    schedule = subparsers.add_parser("schedule", help="engine calls per story without and with the segment scheduler")
+    schedule.add_argument("--words", type=int, nargs="+", default=[800, 5000])
+    schedule.add_argument("--workers", type=int, default=1, help="narration worker processes")
+    schedule.add_argument("--call-cost", type=float, default=0.15, help="fake TTS CPU seconds per engine call")
+    schedule.add_argument("--tts-cost", type=float, default=0.001, help="fake TTS CPU seconds per word")
+    schedule.set_defaults(func=bench_schedule)
+
+    suite = subparsers.add_parser("suite", help="end-to-end timings per stage across story sizes, as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    suite.add_argument("--repeat", type=int, default=3, help="repetitions for the cheap stages (best is kept)")
+    suite.add_argument("--workers", type=int, default=1, help="narration worker processes")
+    suite.add_argument("--tts-cost", type=float, default=0.0005, help="fake TTS CPU seconds per word")
+    suite.add_argument("--sample-rate", type=int, default=8000, help="fake TTS output sample rate")
+    suite.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM time to first chunk")
+    suite.add_argument("--chunk-latency", type=float, default=0.002, help="fake LLM delay between chunks")
+    suite.add_argument("--chunk-size", type=int, default=64, help="fake LLM characters per chunk")
+    suite.add_argument("--output", default="bench_results.json")
+    suite.add_argument("--baseline", help="earlier results file to check for regressions")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Cooperative cancellation for the story and narration pipeline. Long-running calls
+take a cancel event (a threading.Event, or None for none), check it between steps
+and, while blocked on other work, every CANCEL_POLL_INTERVAL seconds.
+"""
+
+# How often (in seconds) a caller waiting on other work checks for cancellation.
+CANCEL_POLL_INTERVAL = 0.05
+
+def check_cancelled(cancel, error):
+    """Raises error (an exception class) if the cancel event is set."""
+    if cancel is not None and cancel.is_set():
+        raise error()
@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import warnings
+
+DEFAULT_CUE_TABLE = os.getenv("NARRATOR_CUES", os.path.join(os.path.dirname(__file__), "cues.json"))
+PROPERTIES = ('rate', 'volume', 'pitch', 'pause_before', 'pause_after')
+OPERATIONS = ('set', 'offset', 'add', 'max')
+CUE_TOKEN = re.compile(r'\[([^\]]+)\]')
+
+class UnknownCueWarning(UserWarning):
+    """Issued for a bracketed cue that is not in the cue table; the cue is ignored."""
+
+def load_cue_table(path=DEFAULT_CUE_TABLE):
+    """Loads the list of cue entries from a JSON cue table (see cues.json)."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["cues"]
+
+class CueCompiler:
+    """
+    Compiles a declarative cue table into per-cue operations against the narrator's
+    default properties, then splits cue-annotated text into (plain_text, properties)
+    segments in a single linear pass.
+
+    Each table entry lists the cue names (aliases) it answers to and any of:
+    'set' (absolute value), 'offset' (default + delta), 'add' (current + delta),
+    'max' (upper bound), plus 'reset' to restore the defaults and 'break' to close
+    the current segment before the cue applies.
+    """
+    def __init__(self, defaults, table=None):
+        self.defaults = dict(defaults)
+        if table is None:
+            table = load_cue_table()
+        self.cues = {}
+        # Raw bracket contents already seen, so each distinct spelling is normalized once.
+        self.resolved = {}
+        for entry in table:
+            compiled = self._compile(entry)
+            for name in entry["names"]:
+                self.cues[name.strip().upper()] = compiled
+
+    def _compile(self, entry):
+        for field in entry:
+            if field not in OPERATIONS + ('names', 'reset', 'break'):
+                raise ValueError(f"Error: unknown field '{field}' in cue {entry['names']}.")
+        updates = {}
+        relative = []
+        for operation in OPERATIONS:
+            for name, value in entry.get(operation, {}).items():
+                if name not in PROPERTIES:
+                    raise ValueError(f"Error: unknown property '{name}' in cue {entry['names']}.")
+                if operation == 'set':
+                    updates[name] = value
+                elif operation == 'offset':
+                    # Offsets are relative to the defaults, so they compile to absolute values.
+                    updates[name] = self.defaults[name] + value
+                else:
+                    relative.append((operation == 'add', name, value))
+        return bool(entry.get('break')), bool(entry.get('reset')), updates, tuple(relative)
+
+    def lookup(self, instruction):
+        """Returns the compiled cue for the raw text between brackets, or None if unknown."""
+        cue = self.resolved.get(instruction)
+        if cue is None:
+            cue = self.cues.get(instruction.strip().upper())
+            if cue is None:
+                warnings.warn(f"Unknown modulation cue [{instruction.strip()}] ignored.", UnknownCueWarning, stacklevel=3)
+                return None
+            if len(self.resolved) < 4096:
+                self.resolved[instruction] = cue
+        return cue
+
+    def parse(self, text, properties=None):
+        """
+        Splits text into segments starting from the given properties (the defaults if
+        None). Returns the segments and the properties in effect at the end of the text.
+        """
+        current = dict(self.defaults if properties is None else properties)
+        segments = []
+        # Even entries are text, odd entries are the cue between them.
+        parts = CUE_TOKEN.split(text)
+        texts = parts[0::2]
+        segment_start = 0
+        for index, instruction in enumerate(parts[1::2]):
+            cue = self.lookup(instruction)
+            if cue is None:
+                continue
+            closes, resets, updates, relative = cue
+            if closes:
+                current_text = "".join(texts[segment_start:index + 1])
+                if current_text:
+                    segments.append((current_text.strip(), dict(current)))
+                segment_start = index + 1
+            if resets:
+                current = dict(self.defaults)
+            if updates:
+                current.update(updates)
+            for is_add, name, value in relative:
+                if is_add:
+                    current[name] += value
+                else:
+                    current[name] = min(current[name], value)
+        current_text = "".join(texts[segment_start:])
+        if current_text:
+            segments.append((current_text.strip(), dict(current)))
+        return segments, current
@@ -0,0 +1,147 @@
+"""
+Post-synthesis modulation of narration audio: pitch shift, time-stretch and gain
+applied to raw PCM frames with vectorized NumPy operations.
+
+The narrator renders every segment with its neutral voice and lets this stage
+apply the cue's rate, pitch and volume, so modulation works the same with any TTS
+engine (many ignore the 'pitch' property) and a cached neutral render can be
+re-modulated for a different cue without running the engine again.
+"""
+import numpy as np
+
+# NumPy sample types per WAV sample width; 8-bit WAV is unsigned, wider widths are signed.
+DTYPES = {1: np.dtype('u1'), 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+# Length of the analysis window used for time-stretching (rounded to a power of two in samples).
+WINDOW_MS = 46
+
+def modulation_for(properties, defaults):
+    """
+    Maps cue properties to (stretch, pitch, gain) relative to a render made with the
+    default properties: rate is in words per minute, so the duration scales with
+    default rate / rate; pitch and volume scale with their ratio to the defaults.
+    Returns None when the properties are the defaults, i.e. nothing is to be done.
+    """
+    stretch = defaults['rate'] / max(properties['rate'], 1)
+    pitch = properties['pitch'] / defaults['pitch']
+    gain = properties['volume'] / defaults['volume']
+    if stretch == 1 and pitch == 1 and gain == 1:
+        return None
+    return stretch, pitch, gain
+
+def supported(params):
+    """Whether frames in the given (channels, sample width, frame rate) format can be modulated."""
+    return params[1] in DTYPES
+
+def to_samples(frames, params):
+    """Decodes PCM frames into a float32 array of shape (frames, channels)."""
+    channels, sample_width, frame_rate = params
+    samples = np.frombuffer(frames, DTYPES[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        samples -= 128
+    return samples.reshape(-1, channels)
+
+def to_frames(samples, params):
+    """Encodes a (frames, channels) sample array as PCM frames, clipping to the sample range."""
+    channels, sample_width, frame_rate = params
+    dtype = DTYPES[sample_width]
+    if sample_width == 1:
+        samples = samples + 128
+    info = np.iinfo(dtype)
+    return np.clip(np.rint(samples), info.min, info.max).astype(dtype).tobytes()
+
+def apply_gain(samples, gain):
+    return samples * np.float32(gain)
+
+def resample(samples, length):
+    """Linearly interpolates samples to length frames (changes pitch and duration together)."""
+    if length == len(samples):
+        return samples
+    if len(samples) < 2 or length < 2:
+        return np.zeros((max(length, 0), samples.shape[1]), np.float32)
+    positions = np.linspace(0, len(samples) - 1, length)
+    source = np.arange(len(samples))
+    out = np.empty((length, samples.shape[1]), np.float32)
+    for channel in range(samples.shape[1]):
+        out[:, channel] = np.interp(positions, source, samples[:, channel])
+    return out
+
+def time_stretch(samples, factor, frame_rate, window_ms=WINDOW_MS):
+    """
+    Stretches samples to factor times their duration without changing the pitch,
+    with a phase vocoder: the short-time spectrum is read at fractional frame
+    positions 1 / factor apart, each bin's phase advancing by its measured
+    instantaneous frequency, and resynthesized by overlap-add at the original hop.
+    Every frame is processed at once; the phase accumulation is a cumulative sum.
+    """
+    length = int(round(len(samples) * factor))
+    n_fft = 2 ** int(round(np.log2(frame_rate * window_ms / 1000)))
+    if factor == 1 or len(samples) < n_fft:
+        return resample(samples, length)
+    hop = n_fft // 4
+    channels = samples.shape[1]
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+
+    # Frames start at the first sample: a frame that is partly padding would skew the
+    # phase advance measured from it, and that error would carry into every later frame.
+    padded = np.concatenate([samples, np.zeros((n_fft, channels), np.float32)])
+    count = 1 + (len(padded) - n_fft) // hop
+    index = np.arange(count)[:, None] * hop + np.arange(n_fft)
+    spectrum = np.fft.rfft(padded[index] * window[None, :, None], axis=1)
+
+    steps = np.arange(0, count - 1, 1 / factor)
+    base = steps.astype(np.int64)
+    fraction = (steps - base)[:, None, None].astype(np.float32)
+    magnitude = np.abs(spectrum)
+    magnitude = (1 - fraction) * magnitude[base] + fraction * magnitude[base + 1]
+    angle = np.angle(spectrum)
+    expected = (2 * np.pi * hop * np.arange(spectrum.shape[1]) / n_fft).astype(np.float32)[None, :, None]
+    advance = angle[1:] - angle[:-1] - expected
+    advance -= np.float32(2 * np.pi) * np.round(advance / np.float32(2 * np.pi))
+    advance += expected
+    # Accumulated in float64 and wrapped, so the phase stays exact over long segments.
+    phase = np.empty(magnitude.shape, np.float64)
+    phase[0] = angle[0]
+    phase[1:] = angle[0] + np.cumsum(advance[base[:-1]], axis=0, dtype=np.float64)
+    phase = np.remainder(phase, 2 * np.pi).astype(np.float32)
+
+    stretched = np.empty(magnitude.shape, np.complex64)
+    stretched.real = magnitude * np.cos(phase)
+    stretched.imag = magnitude * np.sin(phase)
+    frames = np.fft.irfft(stretched, n_fft, axis=1).astype(np.float32)
+    frames *= window[None, :, None]
+    frames = frames.reshape(len(steps), 4, hop, channels)
+    squared = (window ** 2).reshape(4, hop)
+    out = np.zeros((len(steps) + 3, hop, channels), np.float32)
+    envelope = np.zeros((len(steps) + 3, hop), np.float32)
+    for quarter in range(4):
+        out[quarter:quarter + len(steps)] += frames[:, quarter]
+        envelope[quarter:quarter + len(steps)] += squared[quarter]
+    # Divide by the summed squared windows (1.5 inside, less at the first samples).
+    envelope = np.maximum(envelope, np.float32(0.1))
+    out = (out / envelope[:, :, None]).reshape(-1, channels)[:length]
+    if len(out) < length:
+        out = np.concatenate([out, np.zeros((length - len(out), channels), np.float32)])
+    return out
+
+def pitch_shift(samples, ratio, frame_rate):
+    """Raises the pitch by ratio while keeping the duration (stretch, then resample)."""
+    return modulate_samples(samples, frame_rate, pitch=ratio)
+
+def modulate_samples(samples, frame_rate, stretch=1.0, pitch=1.0, gain=1.0):
+    """
+    Applies the three modulations in at most one stretch and one resample: the audio
+    is time-stretched by stretch * pitch, then resampled to stretch times its
+    original length, which scales the pitch by pitch and the duration by stretch.
+    """
+    length = int(round(len(samples) * stretch))
+    if stretch * pitch != 1:
+        samples = time_stretch(samples, stretch * pitch, frame_rate)
+    samples = resample(samples, length)
+    if gain != 1:
+        samples = apply_gain(samples, gain)
+    return samples
+
+def modulate(frames, params, stretch=1.0, pitch=1.0, gain=1.0):
+    """Modulates raw PCM frames in the given (channels, sample width, frame rate) format."""
+    samples = to_samples(frames, params)
+    return to_frames(modulate_samples(samples, params[2], stretch, pitch, gain), params)
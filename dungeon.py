@@ -0,0 +1,253 @@
+"""
+Multi-turn dungeon sessions: the story continues turn by turn in response to the
+player's actions, with a prompt whose size stays bounded however long the session.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from story_generator import CUE_EXAMPLES, CUE_PATTERN, client_for, generate_story, generate_story_stream, is_error
+
+DEFAULT_SESSIONS_DIR = os.getenv(
+    "DUNGEON_SESSIONS_DIR", os.path.join(os.path.expanduser("~"), ".ai_dungeon_master", "sessions")
+)
+# Token budget of the story context sent with each turn (rolling summary plus recent turns).
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("DUNGEON_CONTEXT_TOKENS", "2000"))
+# Share of the budget reserved for the rolling summary.
+SUMMARY_SHARE = 0.3
+
+TURN_INSTRUCTIONS = """
+You are the dungeon master of an interactive story. Continue the story below in response to the player's action.
+Write the next part only, approximately 150-300 words, without repeating earlier text. Keep the characters, setting and tone consistent,
+and end at a moment that invites the player's next action. Insert bracketed voice modulation instructions
+at appropriate moments to guide the narration. For example:
+"""
+# Sent as the system instruction of turn requests, in place of the story instructions
+# (which ask for a complete 500-800 word story); summary requests get none.
+SESSION_INSTRUCTION = TURN_INSTRUCTIONS.strip("\n") + "\n" + CUE_EXAMPLES.strip("\n")
+
+SUMMARY_INSTRUCTIONS = """
+Update the summary of an interactive story with the events below. Keep every fact the story may need later
+(characters, places, items, goals, unresolved threads) and drop the rest. Reply with the summary only, as plain prose
+without bracketed instructions, in at most {words} words.
+"""
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token); cheap enough to run on every turn."""
+    return -(-len(text) // 4)
+
+def plain_text(story):
+    """The story text without modulation cues or redundant whitespace."""
+    return re.sub(r'\s+', ' ', CUE_PATTERN.sub('', story)).strip()
+
+def clip_to_tokens(text, budget):
+    """Keeps the end of text within budget tokens, cut at a sentence start where possible."""
+    if estimate_tokens(text) <= budget:
+        return text
+    clipped = text[-budget * 4:]
+    sentence = re.search(r'[.!?]\s+', clipped)
+    return clipped[sentence.end():] if sentence else clipped
+
+class DungeonSession:
+    """
+    One interactive story. The first turn narrates the premise (through the usual,
+    cached story generation); every later turn continues it in response to an action.
+
+    Each turn's prompt carries a rolling summary of the older turns plus the most
+    recent turns verbatim, within context_tokens. After a turn, compact() folds turns
+    that no longer fit into the summary with one extra request, so the prompt size,
+    and with it the latency and cost of a turn, stays flat as the session grows.
+    compact_in_background() does so without holding up the next turn, whose prompt
+    then simply carries the turns not yet folded.
+    All turns are kept (and saved) for display; only the prompt is bounded.
+    """
+    def __init__(self, premise, session_id=None, context_tokens=DEFAULT_CONTEXT_TOKENS):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.premise = premise
+        self.context_tokens = context_tokens
+        self.summary = ""
+        # Each turn is {"action": str or None, "story": str (with cues)}.
+        self.turns = []
+        # Turns [0, summarized) are represented by the summary in prompts.
+        self.summarized = 0
+        self.created = self.updated = time.time()
+        self.lock = threading.Lock()
+        # Serializes compactions (each folds the oldest turns) and saves.
+        self.compact_lock = threading.Lock()
+        self.save_lock = threading.Lock()
+
+    @property
+    def summary_tokens(self):
+        return int(self.context_tokens * SUMMARY_SHARE)
+
+    def recent_turns(self):
+        return self.turns[self.summarized:]
+
+    @staticmethod
+    def format_turn(turn):
+        story = plain_text(turn["story"])
+        if turn["action"] is None:
+            return f"Narrator: {story}"
+        return f"Player: {turn['action']}\nNarrator: {story}"
+
+    def turn_prompt(self, action):
+        """The prompt for the turn answering action: premise, summary, recent turns (see SESSION_INSTRUCTION)."""
+        parts = [f'Premise:\n"{self.premise}"']
+        if self.summary:
+            parts.append(f"Story so far (summary):\n{self.summary}")
+        recent = self.recent_turns()
+        if recent:
+            # Normally within budget after compact(); clipping bounds a single oversized turn.
+            recent_text = "\n\n".join(self.format_turn(turn) for turn in recent)
+            parts.append("Most recent turns:\n" + clip_to_tokens(recent_text, self.context_tokens - self.summary_tokens))
+        parts.append(f'Player action:\n"{action}"')
+        return "\n\n".join(parts)
+
+    def stream_turn(self, action=None, model=None, fresh=False, cancel=None):
+        """
+        Yields the text of the next turn as it is generated and records the turn when
+        it completes. With no turns yet, the turn is the story for the premise.
+        Setting the cancel event cancels the request and raises GenerationCancelled.
+        """
+        if not self.turns:
+            chunks = generate_story_stream(self.premise, fresh=fresh, model=model, cancel=cancel)
+        else:
+            chunks = client_for(model, SESSION_INSTRUCTION).stream_prompt_sync(self.turn_prompt(action), cancel)
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        if not any(is_error(chunk) for chunk in received):
+            self.record(action, "".join(received))
+
+    def play_turn(self, action=None, model=None, fresh=False, cancel=None):
+        """Blocking counterpart of stream_turn; returns the text of the turn."""
+        if not self.turns:
+            story = generate_story(self.premise, fresh=fresh, model=model, cancel=cancel)
+        else:
+            story = client_for(model, SESSION_INSTRUCTION).complete_sync(self.turn_prompt(action), cancel)
+        self.record(action, story)
+        return story
+
+    def record(self, action, story):
+        """Adds a completed turn. Failed generations are not recorded, so the action can be retried."""
+        if not story or is_error(story):
+            return False
+        with self.lock:
+            self.turns.append({"action": action, "story": story})
+            self.updated = time.time()
+        return True
+
+    def context_size(self):
+        """Estimated tokens of the story context the next turn's prompt will carry."""
+        recent = "\n\n".join(self.format_turn(turn) for turn in self.recent_turns())
+        return estimate_tokens(self.summary) + estimate_tokens(recent)
+
+    def compact(self, model=None):
+        """
+        Folds the oldest recent turns into the summary until the recent turns fit in
+        what the summary leaves of the budget. The newest turn always stays verbatim.
+        If the summary request fails, the turns are folded in as plain text, clipped.
+        Returns the number of turns folded.
+        """
+        with self.compact_lock:
+            return self._compact(model)
+
+    def compact_in_background(self, model=None, on_done=None):
+        """
+        Runs compact() and then save() on a background thread and returns at once.
+        on_done(folded), if given, is called on that thread when both are done.
+        """
+        def run():
+            folded = self.compact(model=model)
+            self.save()
+            if on_done is not None:
+                on_done(folded)
+
+        thread = threading.Thread(target=run, name="dungeon-compact", daemon=True)
+        thread.start()
+        return thread
+
+    def _compact(self, model):
+        window = self.context_tokens - self.summary_tokens
+        with self.lock:
+            recent = self.recent_turns()
+            sizes = [estimate_tokens(self.format_turn(turn)) for turn in recent]
+            total = sum(sizes) + len(sizes)
+            fold = 0
+            while fold < len(recent) - 1 and total > window:
+                total -= sizes[fold] + 1
+                fold += 1
+            folded = recent[:fold]
+        if not folded:
+            return 0
+        events = "\n\n".join(self.format_turn(turn) for turn in folded)
+        words = self.summary_tokens * 3 // 4
+        prompt = SUMMARY_INSTRUCTIONS.strip("\n").format(words=words)
+        prompt += f"\n\nCurrent summary:\n{self.summary or '(none yet)'}\n\nNew events:\n{events}"
+        summary = client_for(model, system_instruction=None).complete_sync(prompt)
+        if is_error(summary):
+            summary = f"{self.summary} {plain_text(events)}"
+        with self.lock:
+            self.summary = clip_to_tokens(plain_text(summary), self.summary_tokens)
+            self.summarized += len(folded)
+            self.updated = time.time()
+        return len(folded)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "session_id": self.session_id,
+                "premise": self.premise,
+                "context_tokens": self.context_tokens,
+                "summary": self.summary,
+                "summarized": self.summarized,
+                "turns": list(self.turns),
+                "created": self.created,
+                "updated": self.updated,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data["premise"], data["session_id"], data.get("context_tokens", DEFAULT_CONTEXT_TOKENS))
+        session.summary = data.get("summary", "")
+        session.summarized = data.get("summarized", 0)
+        session.turns = data.get("turns", [])
+        session.created = data.get("created", session.created)
+        session.updated = data.get("updated", session.updated)
+        return session
+
+    def save(self, directory=DEFAULT_SESSIONS_DIR):
+        """Writes the session to directory/<session_id>.json, atomically."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.session_id}.json")
+        tmp_path = path + ".tmp"
+        with self.save_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, session_id, directory=DEFAULT_SESSIONS_DIR):
+        with open(os.path.join(directory, f"{session_id}.json"), encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+def list_sessions(directory=DEFAULT_SESSIONS_DIR):
+    """Returns (session_id, premise, turn count, last update) of saved sessions, most recent first."""
+    sessions = []
+    if not os.path.isdir(directory):
+        return sessions
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        sessions.append((data["session_id"], data["premise"], len(data.get("turns", [])), data.get("updated", 0)))
+    sessions.sort(key=lambda session: session[3], reverse=True)
+    return sessions
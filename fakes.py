@@ -0,0 +1,191 @@
+import time
+import math
+import asyncio
+import wave
+from array import array
+
+SAMPLE_STORY = (
+    "[SOFT REFLECTIVE TONE] The old castle stood silently on the hill, its ancient stones gleaming in the moonlight. "
+    "[CONVERSATIONAL TONE] Alice approached the heavy wooden door. \"Is anyone there?\" she called out nervously. "
+    "[PAUSE] [FASTER PACE] [ENERGETIC TONE] Suddenly, a crash echoed through the hallway! Something was moving quickly in the darkness. "
+    "[INCREASED VOLUME] \"Who goes there?\" demanded a deep voice from within. "
+    "[THRILLING] [TENSE TREMBLING TONE] Alice's heart raced as she contemplated her next move. "
+    "[SCENE CHANGE] [SOMBER HEAVY TONE] By dawn the castle was empty again, and only her footprints remained in the dust."
+)
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class FakeServiceUnavailable(Exception):
+    """Transient failure, shaped like google.api_core's 503 error."""
+    code = 503
+
+
+class FakeStreamingModel:
+    """
+    Local stand-in for genai.GenerativeModel. It replays a canned story, either in
+    one response or as a stream of small chunks, with configurable latency so the
+    streaming pipeline can be exercised without network access or an API key.
+    The first `failures` requests fail with a transient 503, to exercise retries.
+    Every prompt received is recorded in `prompts`.
+    """
+    model_name = "fake-streaming"
+
+    def __init__(self, story=SAMPLE_STORY, chunk_size=24, first_chunk_latency=0.8, chunk_latency=0.05,
+                 failures=0, system_instruction=None):
+        self.story = story
+        self.chunk_size = chunk_size
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_latency = chunk_latency
+        self.failures = failures
+        self.system_instruction = system_instruction
+        self.prompts = []
+
+    def _request(self, prompt):
+        self.prompts.append(prompt)
+        if self.failures > 0:
+            self.failures -= 1
+            raise FakeServiceUnavailable("503 Service Unavailable (fake)")
+
+    def _chunks(self):
+        return [self.story[i:i + self.chunk_size] for i in range(0, len(self.story), self.chunk_size)]
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self._request(prompt)
+        if stream:
+            return self._stream()
+        time.sleep(self.first_chunk_latency + self.chunk_latency * max(len(self._chunks()) - 1, 0))
+        return _Chunk(self.story)
+
+    def _stream(self):
+        time.sleep(self.first_chunk_latency)
+        for i, chunk in enumerate(self._chunks()):
+            if i:
+                time.sleep(self.chunk_latency)
+            yield _Chunk(chunk)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self._request(prompt)
+        if stream:
+            return self._astream()
+        await asyncio.sleep(self.first_chunk_latency + self.chunk_latency * max(len(self._chunks()) - 1, 0))
+        return _Chunk(self.story)
+
+    async def _astream(self):
+        await asyncio.sleep(self.first_chunk_latency)
+        for i, chunk in enumerate(self._chunks()):
+            if i:
+                await asyncio.sleep(self.chunk_latency)
+            yield _Chunk(chunk)
+
+    def count_tokens(self, contents):
+        """Rough token count (about four characters per token), including the system instruction."""
+        text = contents + (self.system_instruction or "")
+        return _TokenCount(-(-len(text) // 4))
+
+
+
+class _FakeVoice:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class FakeTTSEngine:
+    """
+    Local stand-in for a pyttsx3 engine. save_to_file/runAndWait write deterministic
+    16-bit mono PCM (a quiet tone) whose length follows the word count and the 'rate'
+    property in words per minute, so durations are realistic. synthesis_cost is the
+    CPU time burned per word, to mimic the engine's own rendering work, and call_cost
+    the CPU time burned per runAndWait() call, to mimic its fixed per-call overhead.
+    """
+    sample_rate = 22050
+
+    def __init__(self, synthesis_cost=0.002, sample_rate=22050, call_cost=0.0):
+        self.synthesis_cost = synthesis_cost
+        self.sample_rate = sample_rate
+        self.call_cost = call_cost
+        self.properties = {
+            'rate': 200,
+            'volume': 1.0,
+            'pitch': 100,
+            'voice': 'fake-voice',
+            'voices': [_FakeVoice('fake-voice', 'Fake Voice')],
+        }
+        self.queued = []
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def save_to_file(self, text, filename):
+        self.queued.append((text, filename, dict(self.properties)))
+
+    def runAndWait(self):
+        queued, self.queued = self.queued, []
+        deadline = time.process_time() + self.call_cost
+        while time.process_time() < deadline:
+            pass
+        for text, filename, properties in queued:
+            words = len(text.split())
+            deadline = time.process_time() + self.synthesis_cost * words
+            while time.process_time() < deadline:
+                pass
+            seconds = words * 60.0 / max(properties['rate'], 1)
+            frames = tone_frames(int(seconds * self.sample_rate), properties['volume'], properties['pitch'],
+                                 self.sample_rate)
+            with wave.open(filename, 'wb') as out:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(self.sample_rate)
+                out.writeframes(frames)
+
+
+def tone_frames(frame_count, volume=1.0, pitch=100, sample_rate=FakeTTSEngine.sample_rate):
+    """Returns frame_count frames of a 16-bit mono tone, built by tiling a single period."""
+    period = max(int(sample_rate / (2.2 * pitch)), 2)
+    amplitude = 3000 * volume
+    cycle = array('h', (int(amplitude * math.sin(2 * math.pi * n / period)) for n in range(period))).tobytes()
+    repeats, remainder = divmod(frame_count, period)
+    return cycle * repeats + cycle[:remainder * 2]
+
+
+def fake_engine():
+    """Picklable engine factory for VoiceNarrator(engine_factory=...)."""
+    return FakeTTSEngine()
+
+
+if __name__ == "__main__":
+    # Compare time-to-first-word and time-to-first-sentence of the blocking and the
+    # streaming generation paths against the fake model.
+    from story_generator import generate_text, generate_text_stream, CueStripper, SegmentSplitter
+
+    model = FakeStreamingModel()
+    start = time.perf_counter()
+    generate_text("premise", model=model)
+    blocking = time.perf_counter() - start
+
+    stripper = CueStripper()
+    splitter = SegmentSplitter()
+    first_word = first_sentence = None
+    start = time.perf_counter()
+    for chunk in generate_text_stream("premise", model=model):
+        if first_word is None and stripper.feed(chunk).strip():
+            first_word = time.perf_counter() - start
+        if first_sentence is None and splitter.feed(chunk):
+            first_sentence = time.perf_counter() - start
+    total = time.perf_counter() - start
+
+    print(f"Blocking:  first word after {blocking:.3f} s")
+    print(f"Streaming: first word after {first_word:.3f} s, "
+          f"first narratable sentence after {first_sentence:.3f} s, complete after {total:.3f} s")
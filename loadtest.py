@@ -0,0 +1,161 @@
+"""
+Load test for the narration service (service.py).
+
+    python loadtest.py --jobs 200 --concurrency 16
+    python loadtest.py --url http://127.0.0.1:8080 --jobs 500 --concurrency 64
+
+Without --url, a service is started in a subprocess with the offline stand-ins
+(--stub-llm --fake-tts) and stopped afterwards, so the test runs without network
+access. Each client submits a job, follows its segment stream to the end, and
+submits the next. Rejected submissions (429) are counted and retried after the
+Retry-After delay. Reports p50/p99 of time to first segment and to completion,
+and completed jobs per second.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlsplit
+
+PREMISES = [
+    "A lighthouse keeper finds a door at the bottom of the sea.",
+    "The last dragon applies for a job at the royal library.",
+    "A thief steals a clock that stops time for everyone but her.",
+    "Two rival wizards are snowed in at the same mountain inn.",
+]
+
+async def request(host, port, method, path, payload=None):
+    """Sends one request; returns (status, headers, reader, writer) with the body left unread."""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, reader, writer
+
+async def run_job(host, port, stats, fresh):
+    """Submits one job (retrying on 429) and follows it to the end."""
+    premise = random.choice(PREMISES)
+    while True:
+        started = time.perf_counter()
+        status, headers, reader, writer = await request(host, port, "POST", "/jobs",
+                                                        {"premise": premise, "fresh": fresh})
+        body = await reader.read()
+        writer.close()
+        if status != 429:
+            break
+        stats["rejected"] += 1
+        await asyncio.sleep(float(headers.get("retry-after", "1")) * random.uniform(0.5, 1.0))
+    if status != 202:
+        stats["errors"] += 1
+        return
+    job_id = json.loads(body)["id"]
+    status, _, reader, writer = await request(host, port, "GET", f"/jobs/{job_id}/segments")
+    first_segment = None
+    final = {}
+    async for line in reader:
+        record = json.loads(line)
+        if "index" in record and first_segment is None:
+            first_segment = time.perf_counter() - started
+        elif "status" in record:
+            final = record
+    writer.close()
+    if final.get("status") != "done":
+        stats["errors"] += 1
+        return
+    stats["completion"].append(time.perf_counter() - started)
+    if first_segment is not None:
+        stats["first_segment"].append(first_segment)
+
+async def client(host, port, jobs, stats, fresh):
+    while True:
+        try:
+            jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        await run_job(host, port, stats, fresh)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+async def wait_until_up(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status, _, reader, writer = await request(host, port, "GET", "/health")
+            await reader.read()
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Error: the service at {host}:{port} did not come up.")
+        await asyncio.sleep(0.2)
+
+async def load_test(args):
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    await wait_until_up(host, port)
+    jobs = asyncio.Queue()
+    for i in range(args.jobs):
+        jobs.put_nowait(i)
+    stats = {"completion": [], "first_segment": [], "rejected": 0, "errors": 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, jobs, stats, args.fresh) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    status, _, reader, writer = await request(host, port, "GET", "/health")
+    health = json.loads(await reader.read())
+    writer.close()
+    completed = len(stats["completion"])
+    print(f"{completed} jobs completed in {elapsed:.2f} s ({completed / elapsed:.2f} jobs/s) "
+          f"with {args.concurrency} clients; {stats['rejected']} submissions rejected (429), "
+          f"{stats['errors']} failed.")
+    for name in ("first_segment", "completion"):
+        if stats[name]:
+            print(f"{name.replace('_', ' '):>14}: p50 {percentile(stats[name], 0.5):.3f} s, "
+                  f"p99 {percentile(stats[name], 0.99):.3f} s, max {max(stats[name]):.3f} s")
+    print(f"service: {health['jobs']}")
+    return stats["errors"] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="service to test (default: start one with the offline stand-ins)")
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16, help="clients submitting jobs at once")
+    parser.add_argument("--fresh", action="store_true", help="bypass the story cache for every job")
+    parser.add_argument("--port", type=int, default=8765, help="port for the spawned service")
+    parser.add_argument("--service-args", default="--llm-workers 8 --tts-workers 2 --queue-size 16",
+                        help="extra arguments for the spawned service")
+    args = parser.parse_args()
+
+    process = None
+    if args.url is None:
+        args.url = f"http://127.0.0.1:{args.port}"
+        service = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service.py")
+        process = subprocess.Popen([sys.executable, service, "--port", str(args.port), "--stub-llm",
+                                    "--fake-tts", *args.service_args.split()])
+    try:
+        ok = asyncio.run(load_test(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
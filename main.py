@@ -1,38 +1,418 @@
+import time
+# Taken before the Qt imports so the reported startup time covers the whole launch.
+PROCESS_STARTED = time.perf_counter()
 import sys
 import os
 import re
+import bisect
+import collections
+import queue
 import threading
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTextEdit, QSlider
+    QLabel, QLineEdit, QPushButton, QTextEdit, QSlider, QCheckBox, QInputDialog
 )
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QUrl, QTimer
-from PyQt6.QtGui import QFont
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QUrl, QTimer, QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QFont, QTextCursor, QTextCharFormat, QColor
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+from tracing import tracer
+
+# Hand audio to the player from memory, so it never holds narration files open.
+IN_MEMORY_PLAYBACK = os.getenv("NARRATOR_IN_MEMORY_PLAYBACK", "0") == "1"
+# Initial state of the Stream checkbox; off generates the whole story before narrating it.
+STREAMING = os.getenv("NARRATOR_STREAMING", "1") == "1"
+# Measure how long the event loop is blocked (on by default when tracing).
+STALL_MONITOR = os.getenv("NARRATOR_STALL_MONITOR", "1" if tracer.enabled else "0") == "1"
+# One frame at 60 Hz: a longer stall is visible as a frozen window.
+FRAME_MS = 16
+
+class SegmentPlaylist:
+    """
+    Rendered narration segments laid out on a single timeline that grows as new
+    segments arrive. Maps a timeline position to the segment file covering it.
+    """
+    def __init__(self):
+        self.files = []
+        self.starts = []
+        self.duration = 0
+        self.current = -1
+        self.complete = False
+
+    def append(self, seg_file, start_time, end_time):
+        self.files.append(seg_file)
+        self.starts.append(start_time)
+        self.duration = end_time
+
+    def locate(self, position):
+        """Returns (segment index, offset within that segment) for a timeline position."""
+        index = max(bisect.bisect_right(self.starts, position) - 1, 0)
+        return index, position - self.starts[index]
+
+def utf16_len(text):
+    """Length of text in UTF-16 code units, the unit of QTextDocument positions."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+class HighlightIndex:
+    """
+    Maps narration time to the character range of the segment being spoken, for
+    highlighting in the story display. Segment start times arrive in order, so they
+    form a sorted list searched with bisect. Displayed text (cues stripped) is
+    added piece by piece as it appears; each narrated segment is matched against it
+    from where the previous one ended, so building the index is linear in the
+    length of the story.
+    """
+    def __init__(self):
+        self.starts = []
+        self.ranges = []
+        self.pieces = collections.deque()
+        self.base = 0       # document position of pieces[0]
+        self.offset = 0     # characters of pieces[0] already matched
+        self.offset16 = 0   # the same, in UTF-16 code units
+
+    def add_text(self, display_text):
+        self.pieces.append(display_text)
+
+    def skip_text(self, display_text):
+        """Adds displayed text that is not narrated (e.g. the player's action); earlier text counts as spoken."""
+        while self.pieces:
+            self.base += self.offset16 + utf16_len(self.pieces.popleft()[self.offset:])
+            self.offset = self.offset16 = 0
+        self.base += utf16_len(display_text)
+
+    def add_segment(self, segment_text, start_time):
+        """Indexes a segment; returns False if its text is not found in the display."""
+        # Look in the current piece, then past pieces that have nothing left to speak
+        # (e.g. only a cue), and at most one piece further.
+        unmatched = 0
+        for depth, piece in enumerate(self.pieces):
+            offset = self.offset if depth == 0 else 0
+            position = piece.find(segment_text, offset)
+            if position >= 0:
+                break
+            if piece[offset:].strip():
+                unmatched += 1
+                if unmatched == 2:
+                    return self.add_merged_segment(segment_text, start_time)
+        else:
+            return self.add_merged_segment(segment_text, start_time)
+        for _ in range(depth):
+            # The rest of the earlier pieces has been spoken.
+            self.base += self.offset16 + utf16_len(self.pieces.popleft()[self.offset:])
+            self.offset = self.offset16 = 0
+        start = self.base + self.offset16 + utf16_len(piece[self.offset:position])
+        end = start + utf16_len(segment_text)
+        self.offset = position + len(segment_text)
+        self.offset16 = end - self.base
+        self.starts.append(start_time)
+        self.ranges.append((start, end))
+        return True
+
+    def add_merged_segment(self, segment_text, start_time):
+        """
+        Indexes a segment the narrator merged from several pieces (see
+        SegmentScheduler): its words are matched across the pieces, whatever
+        whitespace joined them. Only text just ahead of the last match is searched.
+        """
+        words = segment_text.split()
+        if not words:
+            return False
+        pattern = re.compile(r'\s+'.join(map(re.escape, words)))
+        limit = 2 * len(segment_text) + 200
+        text = ""
+        match = None
+        for depth, piece in enumerate(self.pieces):
+            text += piece[self.offset:] if depth == 0 else piece
+            if len(text) >= len(segment_text):
+                match = pattern.search(text)
+                if match is not None or len(text) > limit:
+                    break
+        if match is None:
+            return False
+        start = self.base + self.offset16 + utf16_len(text[:match.start()])
+        end = start + utf16_len(match.group())
+        remaining = match.end()
+        while remaining > len(self.pieces[0]) - self.offset:
+            # This piece has been spoken to its end.
+            remaining -= len(self.pieces[0]) - self.offset
+            self.base += self.offset16 + utf16_len(self.pieces.popleft()[self.offset:])
+            self.offset = self.offset16 = 0
+        self.offset16 += utf16_len(self.pieces[0][self.offset:self.offset + remaining])
+        self.offset += remaining
+        self.starts.append(start_time)
+        self.ranges.append((start, end))
+        return True
+
+    def locate(self, position):
+        """Index of the segment being spoken at position (ms), or -1 before the first."""
+        return bisect.bisect_right(self.starts, position) - 1
+
+class StallMonitor:
+    """
+    Measures event-loop stalls: a precise timer is due every frame, and the time by
+    which it fires late is time the GUI thread spent unable to repaint or react to
+    input. Stalls longer than a frame are logged as "gui.stall" spans; the longest
+    since reset() is shown in the status line.
+    """
+    def __init__(self, parent, interval_ms=FRAME_MS):
+        self.interval = interval_ms / 1000
+        self.timer = QTimer(parent)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.tick)
+        self.last = None
+        self.reset()
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def reset(self):
+        self.longest = 0.0
+        self.stalls = 0
+
+    def tick(self):
+        now = time.perf_counter()
+        stall = max(now - self.last - self.interval, 0.0)
+        self.last = now
+        self.longest = max(self.longest, stall)
+        if stall > self.interval:
+            self.stalls += 1
+            if tracer.enabled:
+                tracer.record("gui.stall", stall, {})
+
+    def summary(self):
+        return f"longest GUI stall {self.longest * 1000:.0f} ms ({self.stalls} over a frame)"
 
 class StoryWorker(QThread):
     # Emits the full story (with modulation cues) and a cleaned version (for display)
     story_generated = pyqtSignal(str, str)
     status_update = pyqtSignal(str)
+    # Streaming mode: cleaned text as it arrives, and complete sentences (with cues) for narration
+    story_chunk = pyqtSignal(str)
+    segment_ready = pyqtSignal(str)
+    # An error that ended the generation (e.g. a missing API key)
+    failed = pyqtSignal(str)
 
-    def __init__(self, premise):
+    def __init__(self, premise, stream=True, model=None, fresh=False, session=None, action=None):
         super().__init__()
         self.premise = premise
+        self.stream = stream
+        self.model = model
+        # Bypass the generation cache for a new variation of a known premise.
+        self.fresh = fresh
+        # Dungeon session mode: generate the session's next turn, answering action.
+        self.session = session
+        self.action = action
+        self.first_word_time = None
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """
+        Stops generation at once: the request is cancelled (freeing its slot and any
+        identical requests waiting on it) and nothing is emitted afterwards.
+        """
+        self.cancelled.set()
 
     def run(self):
-        from story_generator import enhance_prompt, generate_text as generate_story
-        enhanced_prompt = enhance_prompt(self.premise)
-        full_story = generate_story(enhanced_prompt)
-        display_story = re.sub(r'\[[^\]]*\]', '', full_story)
-        self.story_generated.emit(full_story, display_story)
+        from story_generator import GenerationCancelled
+        try:
+            self.generate()
+            if self.session is not None and not self.cancelled.is_set():
+                self.session.save()
+                # The summary request runs on its own thread, so the next action is not held up by it.
+                self.session.compact_in_background(self.model, self.on_compacted)
+        except GenerationCancelled:
+            return
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.failed.emit(str(e))
+
+    def on_compacted(self, folded):
+        if folded:
+            self.status_update.emit("Earlier turns summarized.")
+
+    def story_chunks(self):
+        if self.session is not None:
+            return self.session.stream_turn(self.action, model=self.model, fresh=self.fresh, cancel=self.cancelled)
+        from story_generator import generate_story_stream
+        return generate_story_stream(self.premise, fresh=self.fresh, model=self.model, cancel=self.cancelled)
+
+    def generate(self):
+        from story_generator import CUE_PATTERN, generate_story
+        started = time.perf_counter()
+        if not self.stream:
+            if self.session is not None:
+                full_story = self.session.play_turn(self.action, model=self.model, fresh=self.fresh, cancel=self.cancelled)
+            else:
+                full_story = generate_story(self.premise, fresh=self.fresh, model=self.model, cancel=self.cancelled)
+            if self.cancelled.is_set():
+                return
+            self.first_word_time = time.perf_counter() - started
+            display_story = CUE_PATTERN.sub('', full_story)
+            self.story_generated.emit(full_story, display_story)
+            self.status_update.emit("Story generated.")
+            return
+
+        from story_generator import CueStripper, SegmentSplitter
+        stripper = CueStripper()
+        splitter = SegmentSplitter()
+        chunks = []
+        story_chunks = self.story_chunks()
+        try:
+            for chunk in story_chunks:
+                if self.cancelled.is_set():
+                    return
+                chunks.append(chunk)
+                display_chunk = stripper.feed(chunk)
+                if display_chunk:
+                    if self.first_word_time is None and display_chunk.strip():
+                        self.first_word_time = time.perf_counter() - started
+                        self.status_update.emit(f"Generating story... (first words after {self.first_word_time:.2f} s)")
+                    self.story_chunk.emit(display_chunk)
+                for piece in splitter.feed(chunk):
+                    self.segment_ready.emit(piece)
+        finally:
+            # Closing the stream cancels the request; an unfinished turn is not recorded.
+            story_chunks.close()
+        if self.cancelled.is_set():
+            return
+        display_tail = stripper.flush()
+        if display_tail:
+            self.story_chunk.emit(display_tail)
+        for piece in splitter.flush():
+            self.segment_ready.emit(piece)
+        full_story = "".join(chunks)
+        self.story_generated.emit(full_story, CUE_PATTERN.sub('', full_story))
         self.status_update.emit("Story generated.")
 
+class NarrationWorker(QThread):
+    """
+    Narrates a story while it is still being generated. Complete sentences are
+    queued with enqueue() and synthesized in order on this thread; finish() marks
+    the end of the story, after which the segments are assembled into one file.
+    narration_ready carries the file, the segment mapping and the disk usage report.
+    Segment times are shifted by time_offset, to place a dungeon turn after the
+    narration of the previous ones.
+
+    Given the complete story as text, the worker narrates it in one go instead.
+    Either way it reports progress as (segments done, total, complete); while the
+    story is still arriving, total counts the segments known so far and complete
+    is False. cancel() stops either kind of narration after the segment being
+    synthesized; its files are deleted and narration_ready is not emitted. A
+    narration that fails emits failed with the error instead.
+    """
+    segment_rendered = pyqtSignal(str, int, int, str)
+    narration_ready = pyqtSignal(str, list, dict)
+    progress = pyqtSignal(int, int, bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, narrator=None, time_offset=0, text=None):
+        super().__init__()
+        self.pieces = queue.Queue()
+        self.narrator = narrator
+        self.time_offset = time_offset
+        self.text = text
+        self.cancelled = threading.Event()
+        self.first_audio_time = None
+        self.setup_time = 0.0
+
+    def enqueue(self, piece):
+        self.pieces.put(piece)
+
+    def finish(self):
+        self.pieces.put(None)
+
+    def cancel(self):
+        self.cancelled.set()
+        # Wakes a narration waiting for the next sentence of the story.
+        self.finish()
+
+    def iter_pieces(self):
+        while True:
+            piece = self.pieces.get()
+            if piece is None:
+                return
+            yield piece
+
+    def run(self):
+        from voice_generator import NarrationCancelled, get_shared_narrator
+        started = time.perf_counter()
+
+        def on_segment(seg_file, start_time, end_time, segment_text):
+            if self.first_audio_time is None:
+                self.first_audio_time = time.perf_counter() - started
+            self.segment_rendered.emit(seg_file, start_time + self.time_offset, end_time + self.time_offset,
+                                       segment_text)
+
+        try:
+            narrator = self.narrator or get_shared_narrator()
+            self.setup_time = time.perf_counter() - started
+            if self.text is not None:
+                audio_file, mapping = narrator.save_to_temp_file(
+                    self.text, self.cancelled, lambda done, total: self.progress.emit(done, total, True))
+            else:
+                audio_file, mapping = narrator.save_stream_to_temp_file(self.iter_pieces(), on_segment,
+                                                                        self.cancelled, self.progress.emit)
+        except NarrationCancelled:
+            return
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.failed.emit(str(e))
+            return
+        self.narration_ready.emit(audio_file, mapping, narrator.last_usage or {})
+
+class WarmupWorker(QThread):
+    """
+    Runs right after the window is shown: imports the heavy modules, configures the
+    Gemini client and creates the shared narrator (TTS engine, voice list, worker
+    pool) while the user is still typing a premise.
+    """
+    warmed = pyqtSignal(str)
+
+    def run(self):
+        timings = []
+        started = time.perf_counter()
+        try:
+            from story_generator import get_client
+            get_client().start()
+            timings.append(f"Gemini client {time.perf_counter() - started:.2f} s")
+        except Exception as e:
+            timings.append(f"Gemini client unavailable ({e})")
+        started = time.perf_counter()
+        try:
+            from voice_generator import get_shared_narrator
+            get_shared_narrator().warm_up()
+            timings.append(f"narrator {time.perf_counter() - started:.2f} s")
+        except Exception as e:
+            timings.append(f"narrator unavailable ({e})")
+        self.warmed.emit(", ".join(timings))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AI Dungeon Master")
         self.resize(1000, 800)
-        self.narrator = None
+        self.worker = None
+        # Final narrations of the current story (one per turn in a dungeon session).
+        self.narration_files = []
+        self.audio_buffer = None
+        self.session = None
+        # Dungeon sessions take the next action once both the turn and its narration are done.
+        self.turn_pending = False
+        self.narration_pending = False
+        self.narration_worker = None
+        self.stale_workers = []
+        # Progressive playback state: segments play as soon as they are rendered.
+        self.playlist = None
+        self.waiting_for_segment = False
+        self.pending_seek = 0
+        # Karaoke-style highlighting of the segment being spoken.
+        self.highlights = None
+        self.highlighted = -1
+        self.highlight_format = QTextCharFormat()
+        self.highlight_format.setBackground(QColor("#fff2a8"))
         self.player = QMediaPlayer()
         self.audio_output = QAudioOutput()
         self.player.setAudioOutput(self.audio_output)
@@ -41,6 +421,7 @@ class MainWindow(QMainWindow):
         self.timer = QTimer(self)
         self.timer.setInterval(500)
         self.timer.timeout.connect(self.update_position)
+        self.stall_monitor = StallMonitor(self) if STALL_MONITOR else None
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -57,6 +438,19 @@ class MainWindow(QMainWindow):
         self.generate_button = QPushButton("Generate Story")
         self.generate_button.clicked.connect(self.on_generate_story)
         input_layout.addWidget(self.generate_button)
+        self.fresh_checkbox = QCheckBox("Fresh variation")
+        self.fresh_checkbox.setToolTip("Generate a new story even if this premise was generated recently.")
+        input_layout.addWidget(self.fresh_checkbox)
+        self.stream_checkbox = QCheckBox("Stream")
+        self.stream_checkbox.setToolTip("Show and narrate the story sentence by sentence while it is generated.")
+        self.stream_checkbox.setChecked(STREAMING)
+        input_layout.addWidget(self.stream_checkbox)
+        self.session_checkbox = QCheckBox("Dungeon session")
+        self.session_checkbox.setToolTip("Continue the story turn by turn with your own actions.")
+        input_layout.addWidget(self.session_checkbox)
+        self.resume_button = QPushButton("Resume Session")
+        self.resume_button.clicked.connect(self.on_resume_session)
+        input_layout.addWidget(self.resume_button)
         main_layout.addLayout(input_layout)
         
         # --- Story Display Area ---
@@ -91,6 +485,10 @@ class MainWindow(QMainWindow):
         self.reset_button.clicked.connect(self.on_reset)
         controls_layout.addWidget(self.reset_button)
         
+        # Segments narrated so far
+        self.progress_label = QLabel("")
+        controls_layout.addWidget(self.progress_label)
+
         # Playback speed slider and label
         self.speed_label = QLabel("Speed: 1.0x")
         controls_layout.addWidget(self.speed_label)
@@ -115,6 +513,7 @@ class MainWindow(QMainWindow):
         self.setStyleSheet("""
             QMainWindow { background-color: #1E1E2F; }
             QLabel { color: #C7C7C7; font-size: 14px; }
+            QCheckBox { color: #C7C7C7; }
             QLineEdit { background-color: #2E2E3E; color: #FFFFFF; padding: 6px; border: 1px solid #4B4B6B; border-radius: 4px; }
             QPushButton { background-color: #3E64FF; color: #FFFFFF; border: none; border-radius: 4px; padding: 8px 16px; }
             QPushButton:hover { background-color: #5E84FF; }
@@ -126,52 +525,418 @@ class MainWindow(QMainWindow):
         # Connect QMediaPlayer signals to update the position slider.
         self.player.positionChanged.connect(self.position_changed)
         self.player.durationChanged.connect(self.duration_changed)
+        self.player.mediaStatusChanged.connect(self.on_media_status_changed)
         
+    def on_shown(self):
+        """Called from the event loop once the window is on screen."""
+        self.startup_time = time.perf_counter() - PROCESS_STARTED
+        self.status_label.setText(f"Ready in {self.startup_time:.2f} s. Warming up...")
+        if self.stall_monitor is not None:
+            self.stall_monitor.start()
+        self.warmup_worker = WarmupWorker()
+        self.warmup_worker.warmed.connect(self.on_warmed)
+        self.warmup_worker.start()
+
+    def on_warmed(self, timings):
+        if self.status_label.text().startswith("Ready in"):
+            self.status_label.setText(f"Ready in {self.startup_time:.2f} s. Warmed up: {timings}. Awaiting input...")
+
     def on_generate_story(self):
         premise = self.input_field.text().strip()
         if premise.lower() == "quit":
             QApplication.quit()
             sys.exit(0)
-        self.generate_button.setEnabled(False)
+        if not self.session_checkbox.isChecked():
+            self.session = None
+        if self.session is not None and self.session.turns:
+            self.continue_session(premise)
+            return
+        if self.session_checkbox.isChecked():
+            from dungeon import DungeonSession
+            self.session = DungeonSession(premise)
+        # Session turns are always streamed, so each one is appended to the running narration.
+        stream = self.stream_checkbox.isChecked() or self.session is not None
+        # A new premise supersedes the story still being generated or narrated.
+        self.cancel_work()
+        self.release_narration()
+        self.playlist = None
+        self.waiting_for_segment = False
+        if self.session is not None:
+            self.generate_button.setEnabled(False)
         self.status_label.setText("Generating story...")
-        self.worker = StoryWorker(premise)
+        self.progress_label.clear()
+        self.story_display.clear()
+        self.clear_highlight(HighlightIndex())
+        self.generation_started = time.perf_counter()
+        tracer.begin_session(premise=premise, streaming=stream)
+        if self.stall_monitor is not None:
+            self.stall_monitor.reset()
+        self.worker = StoryWorker(premise, stream=stream, fresh=self.fresh_checkbox.isChecked(), session=self.session)
         self.worker.story_generated.connect(self.on_story_generated)
         self.worker.status_update.connect(self.update_status)
+        self.worker.failed.connect(self.on_story_failed)
         self.worker.finished.connect(self.on_worker_finished)
+        if stream:
+            # Narration starts on the first complete sentence, not the full story.
+            self.playlist = SegmentPlaylist()
+            self.start_narration()
         self.worker.start()
-        
+
+    def start_narration(self, time_offset=0):
+        """Starts a NarrationWorker fed by self.worker, with segments placed at time_offset on the timeline."""
+        self.turn_pending = self.narration_pending = True
+        self.progress_label.clear()
+        self.narration_worker = NarrationWorker(time_offset=time_offset)
+        self.narration_worker.segment_rendered.connect(self.on_segment_rendered)
+        self.narration_worker.progress.connect(self.on_narration_progress)
+        self.narration_worker.narration_ready.connect(self.on_narration_ready)
+        self.narration_worker.failed.connect(self.on_narration_failed)
+        self.worker.story_chunk.connect(self.on_story_chunk)
+        # Connected before enqueue, so a piece is indexed before any of its segments is rendered.
+        self.worker.segment_ready.connect(self.on_story_piece)
+        self.worker.segment_ready.connect(self.narration_worker.enqueue)
+        self.narration_worker.start()
+
+    def cancel_work(self):
+        """
+        Stops playback and cancels the story generation and narration in flight. Both
+        workers stop at their next chunk or segment; a cancelled narration deletes
+        its own files.
+        """
+        self.player.stop()
+        # Lets the cancelled narration delete the segment file that was playing.
+        self.player.setSource(QUrl())
+        self.detach_story_worker()
+        self.detach_narration_worker()
+
+    def keep_until_finished(self, worker):
+        """Keeps a reference to a running worker so Qt does not destroy it mid-run."""
+        if not worker.isRunning():
+            return
+        self.stale_workers.append(worker)
+        worker.finished.connect(lambda: self.stale_workers.remove(worker))
+
+    def detach_story_worker(self):
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self.worker.story_generated.disconnect(self.on_story_generated)
+        self.worker.status_update.disconnect(self.update_status)
+        self.worker.failed.disconnect(self.on_story_failed)
+        self.worker.finished.disconnect(self.on_worker_finished)
+        if self.worker.stream:
+            self.worker.story_chunk.disconnect(self.on_story_chunk)
+            self.worker.segment_ready.disconnect(self.on_story_piece)
+        self.keep_until_finished(self.worker)
+        self.worker = None
+
+    def detach_narration_worker(self):
+        if self.narration_worker is None:
+            return
+        self.narration_worker.cancel()
+        # A narration still rendering for the previous story must not feed this playlist.
+        self.narration_worker.progress.disconnect(self.on_narration_progress)
+        self.narration_worker.failed.disconnect(self.on_narration_failed)
+        if self.narration_worker.text is None:
+            self.narration_worker.segment_rendered.disconnect(self.on_segment_rendered)
+            self.narration_worker.narration_ready.disconnect(self.on_narration_ready)
+        else:
+            self.narration_worker.narration_ready.disconnect(self.on_narration_finished)
+        # It may have completed just before it was cancelled.
+        self.narration_worker.narration_ready.connect(self.release_stale_narration)
+        self.keep_until_finished(self.narration_worker)
+        self.narration_worker = None
+
+    def continue_session(self, action):
+        """
+        Plays the next turn of the dungeon session. The action and the new text are
+        appended to the story, and only the new text is narrated, continuing the
+        timeline of the earlier turns.
+        """
+        if not action:
+            return
+        self.generate_button.setEnabled(False)
+        self.input_field.clear()
+        self.status_label.setText("The dungeon master is thinking...")
+        action_text = f"\n\n> {action}\n\n"
+        self.append_text(action_text)
+        self.highlights.skip_text(action_text)
+        self.generation_started = time.perf_counter()
+        tracer.begin_session(premise=self.session.premise, action=action, streaming=True)
+        if self.stall_monitor is not None:
+            self.stall_monitor.reset()
+        self.worker = StoryWorker(self.session.premise, stream=True, session=self.session, action=action)
+        self.worker.story_generated.connect(self.on_story_generated)
+        self.worker.status_update.connect(self.update_status)
+        self.worker.failed.connect(self.on_story_failed)
+        self.worker.finished.connect(self.on_worker_finished)
+        if self.playlist is None:
+            self.playlist = SegmentPlaylist()
+        self.playlist.complete = False
+        self.start_narration(self.playlist.duration)
+        self.worker.start()
+
+    def on_resume_session(self):
+        from dungeon import DungeonSession, list_sessions
+        from story_generator import CUE_PATTERN
+        sessions = list_sessions()
+        if not sessions:
+            self.status_label.setText("No saved dungeon sessions.")
+            return
+        labels = [f"{premise[:60]} ({turns} turns, {time.strftime('%Y-%m-%d %H:%M', time.localtime(updated))})"
+                  for _, premise, turns, updated in sessions]
+        label, ok = QInputDialog.getItem(self, "Resume Session", "Session:", labels, 0, False)
+        if not ok:
+            return
+        self.session = DungeonSession.load(sessions[labels.index(label)][0])
+        self.session_checkbox.setChecked(True)
+        self.cancel_work()
+        self.release_narration()
+        self.playlist = None
+        self.waiting_for_segment = False
+        # Earlier turns are shown but not narrated again.
+        text = ""
+        for turn in self.session.turns:
+            if turn["action"] is not None:
+                text += f"\n\n> {turn['action']}\n\n"
+            text += CUE_PATTERN.sub('', turn["story"])
+        self.story_display.setPlainText(text)
+        self.clear_highlight(HighlightIndex())
+        self.highlights.skip_text(text)
+        self.input_field.clear()
+        self.input_field.setPlaceholderText("What do you do next?")
+        self.status_label.setText(f"Resumed a session of {len(self.session.turns)} turns. What do you do next?")
+
+    # Signals a worker emitted before it was detached are still delivered; the slots
+    # below drop those of any worker but the current one (self.sender()).
+
+    def on_story_piece(self, piece):
+        if self.highlights is not None and self.sender() is self.worker:
+            from story_generator import CUE_PATTERN
+            self.highlights.add_text(CUE_PATTERN.sub('', piece))
+
+    def on_story_chunk(self, text):
+        if self.sender() is self.worker:
+            self.append_text(text)
+
+    def append_text(self, text):
+        cursor = self.story_display.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+
     def on_story_generated(self, full_text, display_text):
+        if self.sender() is not self.worker:
+            return
+        if self.worker.stream:
+            self.narration_worker.finish()
+            self.status_label.setText("Story generated. Finishing narration...")
+            return
         self.story_display.setPlainText(display_text)
-        self.status_label.setText("Story generated. Preparing narration...")
-        
-        from voice_generator import VoiceNarrator
-        self.narrator = VoiceNarrator()
-        
-        # ✅ Extract the correct file path from the tuple
-        audio_file, _ = self.narrator.save_to_temp_file(full_text)
+        self.highlights.add_text(display_text)
+        self.status_label.setText("Story generated. Narrating...")
+        # Synthesis runs on the worker thread; the window stays responsive and shows its progress.
+        self.narration_worker = NarrationWorker(text=full_text)
+        self.narration_worker.progress.connect(self.on_narration_progress)
+        self.narration_worker.narration_ready.connect(self.on_narration_finished)
+        self.narration_worker.failed.connect(self.on_narration_failed)
+        self.narration_worker.start()
+
+    def on_narration_progress(self, done, total, complete):
+        if self.sender() is self.narration_worker:
+            # Until the story is complete, more segments may follow the ones known so far.
+            self.progress_label.setText(f"Narrated: {done}/{total}{'' if complete else '+'} segments")
+
+    def on_narration_finished(self, audio_file, mapping, usage):
+        """Plays the narration of a story narrated as a whole."""
+        if self.sender() is not self.narration_worker:
+            self.release_stale_narration(audio_file)
+            return
+        self.narration_files.append(audio_file)
+        for segment in mapping:
+            self.highlights.add_segment(segment["text"], segment["start_time"])
+        setup_ms = self.narration_worker.setup_time * 1000
+        self.play_narration(audio_file, f" (narrator setup {setup_ms:.0f} ms){self.usage_summary(usage)}")
+        self.show_trace_summary()
+
+    def show_trace_summary(self):
+        """
+        Appends the per-stage timings of this story to the status line, when tracing is
+        on, and the longest event-loop stall, when the stall monitor is.
+        """
+        if tracer.enabled:
+            self.status_label.setText(f"{self.status_label.text()} | {tracer.summary()}")
+        if self.stall_monitor is not None:
+            self.status_label.setText(f"{self.status_label.text()} | {self.stall_monitor.summary()}")
+
+    def on_segment_rendered(self, seg_file, start_time, end_time, segment_text):
+        if self.playlist is None or self.sender() is not self.narration_worker:
+            return
+        self.playlist.append(seg_file, start_time, end_time)
+        self.highlights.add_segment(segment_text, start_time)
+        self.position_slider.setRange(0, self.playlist.duration)
+        if self.playlist.current == -1:
+            elapsed = time.perf_counter() - self.generation_started
+            setup_ms = self.narration_worker.setup_time * 1000
+            self.status_label.setText(
+                f"Playing narration... (first audio after {elapsed:.2f} s, narrator setup {setup_ms:.0f} ms)")
+            self.play_segment(0)
+        elif self.waiting_for_segment:
+            self.status_label.setText("Playing narration...")
+            self.play_segment(self.playlist.current + 1)
+
+    def on_narration_ready(self, audio_file, mapping, usage):
+        if self.sender() is not self.narration_worker:
+            self.release_stale_narration(audio_file)
+            return
+        if self.playlist is None:
+            return
+        self.playlist.complete = True
+        self.narration_files.append(audio_file)
+        self.narration_mapping = mapping
+        if self.waiting_for_segment:
+            self.waiting_for_segment = False
+            self.play_pause_button.setText("Play")
+            self.status_label.setText("Narration finished.")
+        self.status_label.setText(self.status_label.text() + self.usage_summary(usage))
+        self.show_trace_summary()
+        self.narration_pending = False
+        self.end_turn()
+
+    def usage_summary(self, usage):
+        if not usage or "bytes_written" not in usage:
+            return ""
+        from workspace import format_bytes
+        return (f" ({format_bytes(usage['bytes_written'])} written, "
+                f"{format_bytes(usage['bytes_kept'])} kept on disk)")
+
+    def release_narration(self):
+        """Deletes the segment files of the previous story; its final narrations stay in the workspace."""
+        self.release_files(self.narration_files)
+        self.narration_files = []
+
+    def release_stale_narration(self, audio_file, *_):
+        """Deletes the segment files of a narration that completed after it was superseded."""
+        self.release_files([audio_file])
 
+    def release_files(self, narration_files):
+        if not narration_files:
+            return
+        from voice_generator import get_shared_narrator
+        workspace = get_shared_narrator().workspace
+        if workspace is not None:
+            for narration_file in narration_files:
+                workspace.release(narration_file)
+
+    def set_source(self, audio_file):
+        """Points the player at audio_file, or at an in-memory copy of it with IN_MEMORY_PLAYBACK."""
+        if not IN_MEMORY_PLAYBACK:
+            self.player.setSource(QUrl.fromLocalFile(audio_file))
+            return
+        buffer = QBuffer()
+        with open(audio_file, "rb") as f:
+            buffer.setData(QByteArray(f.read()))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        # The URL only tells the backend the file name (and thus the format) of the data.
+        self.player.setSourceDevice(buffer, QUrl.fromLocalFile(audio_file))
+        if self.audio_buffer is not None:
+            self.audio_buffer.close()
+        self.audio_buffer = buffer
+
+    def play_segment(self, index, offset=0):
+        self.playlist.current = index
+        self.waiting_for_segment = False
+        self.pending_seek = offset
+        self.set_source(self.playlist.files[index])
+        self.player.play()
+        self.play_pause_button.setText("Pause")
+        self.timer.start()
+
+    def on_media_status_changed(self, status):
+        if self.playlist is None:
+            return
+        if status in (QMediaPlayer.MediaStatus.LoadedMedia, QMediaPlayer.MediaStatus.BufferedMedia):
+            if self.pending_seek:
+                self.player.setPosition(self.pending_seek)
+                self.pending_seek = 0
+        elif status == QMediaPlayer.MediaStatus.EndOfMedia:
+            next_index = self.playlist.current + 1
+            if next_index < len(self.playlist.files):
+                self.play_segment(next_index)
+            elif not self.playlist.complete:
+                # Playback caught up with synthesis; resume when the next segment lands.
+                self.waiting_for_segment = True
+                self.status_label.setText("Buffering narration...")
+            else:
+                self.play_pause_button.setText("Play")
+                self.status_label.setText("Narration finished.")
+
+    def current_position(self):
+        """Playback position on the narration timeline, across segment files."""
+        if self.playlist is not None and self.playlist.current >= 0:
+            return self.playlist.starts[self.playlist.current] + self.player.position()
+        return self.player.position()
+
+    def play_narration(self, audio_file, detail=""):
         # Ensure the file exists before playing
         if not os.path.exists(audio_file):
             self.status_label.setText("❌ Error: Audio file not found!")
             return
         
-        self.status_label.setText("Narration ready. Playing audio...")
-        self.player.setSource(QUrl.fromLocalFile(audio_file))  # ✅ Now correctly a string
+        self.status_label.setText(f"Narration ready. Playing audio...{detail}")
+        self.set_source(audio_file)
         self.player.play()
         self.play_pause_button.setText("Pause")
         self.timer.start()
         
     def update_status(self, status):
-        self.status_label.setText(status)
+        if self.sender() is self.worker:
+            self.status_label.setText(status)
+
+    def on_story_failed(self, error):
+        if self.sender() is not self.worker:
+            return
+        self.status_label.setText(f"❌ Error: {error}")
+        if self.worker.stream and self.narration_worker is not None:
+            # Narrates what arrived before the failure; its narration_ready ends the turn.
+            self.narration_worker.finish()
+
+    def on_narration_failed(self, error):
+        if self.sender() is not self.narration_worker:
+            return
+        self.status_label.setText(f"❌ Narration error: {error}")
+        if self.playlist is not None:
+            self.playlist.complete = True
+        self.narration_pending = False
+        self.end_turn()
         
     def on_worker_finished(self):
+        if self.sender() is not self.worker:
+            return
+        if self.session is None:
+            self.generate_button.setEnabled(True)
+            return
+        self.turn_pending = False
+        self.end_turn()
+
+    def end_turn(self):
+        """In a dungeon session, takes the next action once the turn and its narration are complete."""
+        if self.session is None or self.turn_pending or self.narration_pending:
+            return
         self.generate_button.setEnabled(True)
+        self.input_field.clear()
+        self.input_field.setPlaceholderText("What do you do next?")
         
     def on_play_pause(self):
-        if self.player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
+        if self.player.playbackState() == QMediaPlayer.PlaybackState.PlayingState or self.waiting_for_segment:
             self.player.pause()
+            self.waiting_for_segment = False
             self.play_pause_button.setText("Play")
             self.status_label.setText("Paused.")
+        elif (self.playlist is not None and self.playlist.current >= 0
+              and self.player.mediaStatus() == QMediaPlayer.MediaStatus.EndOfMedia
+              and self.playlist.current + 1 < len(self.playlist.files)):
+            self.play_segment(self.playlist.current + 1)
+            self.status_label.setText("Playing...")
         else:
             self.player.play()
             self.play_pause_button.setText("Pause")
@@ -179,13 +944,15 @@ class MainWindow(QMainWindow):
             
     def on_forward(self):
         # Skip forward 5 seconds (5000 ms)
-        new_pos = self.player.position() + 5000
-        self.player.setPosition(new_pos)
+        new_pos = self.current_position() + 5000
+        if self.playlist is not None:
+            new_pos = min(new_pos, self.playlist.duration)
+        self.set_position(new_pos)
         self.status_label.setText("Forwarded 5 seconds.")
         
     def on_backward(self):
-        new_pos = max(0, self.player.position() - 5000)
-        self.player.setPosition(new_pos)
+        new_pos = max(0, self.current_position() - 5000)
+        self.set_position(new_pos)
         self.status_label.setText("Rewinded 5 seconds.")
         
     def on_speed_change(self):
@@ -197,26 +964,78 @@ class MainWindow(QMainWindow):
     def on_reset(self):
         # Reset input, story display, audio playback, and status.
         self.input_field.clear()
+        self.input_field.setPlaceholderText("Enter your story premise...")
         self.story_display.clear()
-        self.player.stop()
+        self.clear_highlight()
+        # The session was saved after every turn and can be resumed later.
+        self.session = None
+        self.cancel_work()
+        self.release_narration()
+        self.playlist = None
+        self.waiting_for_segment = False
+        self.turn_pending = self.narration_pending = False
+        self.generate_button.setEnabled(True)
         self.play_pause_button.setText("Play")
         self.speed_slider.setValue(100)
+        self.progress_label.clear()
         self.status_label.setText("Reset complete. Awaiting input...")
         
     def position_changed(self, position):
+        if self.playlist is not None and self.playlist.current >= 0:
+            position += self.playlist.starts[self.playlist.current]
         self.position_slider.setValue(position)
+        self.update_highlight(position)
+
+    def update_highlight(self, position):
+        """
+        Highlights the segment spoken at position (ms on the narration timeline). The
+        highlight is an extra selection, so a change only repaints the old and the new
+        range and never touches the document or its layout.
+        """
+        if self.highlights is None:
+            return
+        index = self.highlights.locate(position)
+        if index == self.highlighted:
+            return
+        self.highlighted = index
+        if index < 0:
+            self.story_display.setExtraSelections([])
+            return
+        start, end = self.highlights.ranges[index]
+        selection = QTextEdit.ExtraSelection()
+        selection.cursor = QTextCursor(self.story_display.document())
+        selection.cursor.setPosition(start)
+        selection.cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        selection.format = self.highlight_format
+        self.story_display.setExtraSelections([selection])
+
+    def clear_highlight(self, highlights=None):
+        self.highlights = highlights
+        self.highlighted = -1
+        self.story_display.setExtraSelections([])
         
     def duration_changed(self, duration):
-        self.position_slider.setRange(0, duration)
+        # In progressive mode the slider spans the whole growing playlist instead.
+        if self.playlist is None:
+            self.position_slider.setRange(0, duration)
         
     def update_position(self):
-        self.position_slider.setValue(self.player.position())
+        self.position_slider.setValue(self.current_position())
         
     def set_position(self, position):
-        self.player.setPosition(position)
+        if self.playlist is None or self.playlist.current < 0:
+            self.player.setPosition(position)
+            return
+        index, offset = self.playlist.locate(position)
+        if index == self.playlist.current:
+            self.player.setPosition(offset)
+        else:
+            self.play_segment(index, offset)
         
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    # Warm-up starts only once the window has been painted, so it never delays it.
+    QTimer.singleShot(0, window.on_shown)
     sys.exit(app.exec())
@@ -0,0 +1,118 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "NARRATOR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ai_dungeon_segment_cache")
+)
+DEFAULT_CACHE_MB = int(os.getenv("NARRATOR_CACHE_MB", "256"))
+
+class SegmentCache:
+    """
+    Content-addressed on-disk cache of synthesized narration segments. Entries are
+    keyed by a hash of the segment text, the voice id and the rate/volume/pitch
+    properties, so replaying a story (or reusing a line) skips the TTS engine.
+
+    Writes go to a temporary file in the cache directory and are moved into place
+    with os.replace, so concurrent processes never see a partial entry. Total size
+    is bounded by max_bytes; the least recently used entries (by mtime, refreshed on
+    every hit) are evicted first.
+    """
+    suffix = ".wav"
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    @classmethod
+    def from_env(cls):
+        """The default cache, or None when disabled with NARRATOR_CACHE_MB=0."""
+        if DEFAULT_CACHE_MB <= 0:
+            return None
+        return cls()
+
+    @staticmethod
+    def key(segment_text, voice_id, properties, engine=""):
+        payload = json.dumps([
+            engine,
+            voice_id,
+            segment_text,
+            properties['rate'],
+            properties['volume'],
+            properties['pitch'],
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key, dest):
+        """Copies the cached segment for key to dest. Returns False on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)  # mark as recently used
+            try:
+                os.link(path, dest)
+            except OSError:
+                shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, src):
+        """Stores the rendered file src under key, atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, open(src, "rb") as data:
+                shutil.copyfileobj(data, out)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self.lock:
+            self.size += os.path.getsize(src)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # already evicted by another process
+            self.size -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.size}
+
+    def _entries(self):
+        """Yields (path, size, mtime) for every cached segment."""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
@@ -0,0 +1,117 @@
+import os
+import re
+
+# Longest unit (in characters) built by merging segments; longer segments are split
+# at sentence ends. NARRATOR_SEGMENT_CHARS=0 disables scheduling.
+DEFAULT_SEGMENT_CHARS = int(os.getenv("NARRATOR_SEGMENT_CHARS", "400"))
+VOICE_PROPERTIES = ('rate', 'volume', 'pitch')
+# A sentence end with any closing quotes or brackets; story_generator's SegmentSplitter uses it too.
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+["\'\u201d\u2019)]*\s+|\n\s*')
+
+class SegmentScheduler:
+    """
+    Sits between cue parsing and synthesis and turns parsed (text, properties)
+    segments into the units the narrator synthesizes, one engine call each:
+
+    - with split set, a segment longer than max_chars is cut at sentence ends, so a
+      long scene renders in parallel and its first audio is ready sooner (without
+      parallel workers or progressive playback, that would only add engine calls);
+    - adjacent segments with the same voice (rate, volume, pitch) and no pause
+      between them are merged, up to max_chars, so cue-dense text does not pay an
+      engine round-trip per cue;
+    - a segment without text (only cues) costs no engine call; its pauses become
+      silence after the previous unit, or before the next one.
+
+    Units keep the (text, properties) shape, with pause_before and pause_after
+    giving the silence to insert around them. The first unit is never merged, and
+    a unit that cannot grow any further is released at once, so narration of a
+    streamed story starts as early as it would without the scheduler.
+    """
+    def __init__(self, max_chars=DEFAULT_SEGMENT_CHARS):
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_env(cls):
+        """The default scheduler, or None when disabled with NARRATOR_SEGMENT_CHARS=0."""
+        if DEFAULT_SEGMENT_CHARS <= 0:
+            return None
+        return cls()
+
+    def schedule(self, segments, split=True):
+        """Yields the units for an iterable of (text, properties) segments, in order."""
+        pending = None
+        silence = 0  # pauses of text-less segments seen before the first unit
+        first = True
+        for text, properties in segments:
+            text = text.strip()
+            if not text:
+                pause = properties['pause_before'] + properties['pause_after']
+                if pending is None:
+                    silence += pause
+                elif pause:
+                    yield self.with_pause(pending, 'pause_after', pause)
+                    pending = None
+                continue
+            for unit in self.split(text, properties) if split else [(text, properties)]:
+                if silence:
+                    unit = self.with_pause(unit, 'pause_before', silence)
+                    silence = 0
+                if pending is not None and self.can_merge(pending, unit):
+                    pending = (pending[0] + " " + unit[0], dict(pending[1], pause_after=unit[1]['pause_after']))
+                else:
+                    if pending is not None:
+                        yield pending
+                    pending = unit
+                if first or not self.can_grow(pending):
+                    first = False
+                    yield pending
+                    pending = None
+        if pending is not None:
+            yield pending
+
+    def split(self, text, properties):
+        """
+        Cuts text at sentence ends into parts of at most max_chars (a longer sentence
+        stays whole). Parts are slices of text, so they match the displayed story.
+        """
+        if len(text) <= self.max_chars:
+            return [(text, properties)]
+        parts = []
+        start = end = 0
+        for match in SENTENCE_END_PATTERN.finditer(text):
+            if end > start and match.end() - start > self.max_chars:
+                parts.append(text[start:end].strip())
+                start = end
+            end = match.end()
+        if end > start and len(text) - start > self.max_chars:
+            parts.append(text[start:end].strip())
+            start = end
+        parts.append(text[start:].strip())
+        parts = [part for part in parts if part]
+        return [
+            (part, dict(
+                properties,
+                pause_before=properties['pause_before'] if i == 0 else 0,
+                pause_after=properties['pause_after'] if i == len(parts) - 1 else 0,
+            ))
+            for i, part in enumerate(parts)
+        ]
+
+    def can_merge(self, unit, following):
+        text, properties = unit
+        next_text, next_properties = following
+        return (
+            properties['pause_after'] == 0
+            and next_properties['pause_before'] == 0
+            and len(text) + 1 + len(next_text) <= self.max_chars
+            and all(properties[name] == next_properties[name] for name in VOICE_PROPERTIES)
+        )
+
+    def can_grow(self, unit):
+        text, properties = unit
+        return properties['pause_after'] == 0 and len(text) < self.max_chars
+
+    @staticmethod
+    def with_pause(unit, name, pause):
+        text, properties = unit
+        return text, dict(properties, **{name: properties[name] + pause})
@@ -0,0 +1,499 @@
+"""
+Local narration service: an asyncio HTTP server in front of the story and narration
+pipeline, for serving many users from one machine.
+
+    python service.py --port 8080 --llm-workers 8 --tts-workers 2 --queue-size 32
+
+Endpoints (JSON unless noted):
+    POST /jobs                      {"premise": "...", "fresh": false} -> 202 {"id": ...},
+                                    or 429 when the job queue is full
+    GET  /jobs/<id>                 status, progress, timings and, once generated, the story
+    GET  /jobs/<id>/segments        streams one JSON line per narrated segment as it becomes
+                                    available, until the job ends
+    GET  /jobs/<id>/segments/<n>    segment n as WAV
+    GET  /jobs/<id>/audio           the complete narration
+    GET  /health                    queue depth, worker counts and job totals
+
+Stories are generated by a pool of asyncio workers on the shared GeminiClient and
+narrated by a separate pool of threads, each with its own VoiceNarrator. Pieces of a
+story are narrated while the rest is still being generated. Jobs wait in a bounded
+queue; when the narration stage is backed up, generation workers stop taking jobs,
+the queue fills and new submissions are rejected with 429 instead of piling up.
+Use --stub-llm and --fake-tts to run offline against the stand-ins in fakes.py.
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from story_generator import (
+    ERROR_PREFIX, GenerationCache, SegmentSplitter, client_for, generation_cache, is_error
+)
+
+# Finished jobs kept for status queries; older ones are forgotten and their files deleted.
+MAX_FINISHED_JOBS = 1000
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+class Job:
+    """One premise moving through generation and narration."""
+    def __init__(self, premise, fresh=False):
+        self.id = uuid.uuid4().hex[:16]
+        self.premise = premise
+        self.fresh = fresh
+        self.status = "queued"
+        self.error = None
+        self.story = None
+        self.generated_chars = 0
+        self.segments = []
+        self.final_file = None
+        self.usage = {}
+        self.times = {"submitted": time.time()}
+        # Story pieces for the narration thread; None marks the end of the story.
+        self.pieces = queue.Queue()
+        self.changed = asyncio.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    async def update(self, **fields):
+        """Sets attributes and wakes up every request following this job."""
+        async with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if "status" in fields:
+                self.times[fields["status"]] = time.time()
+            self.changed.notify_all()
+
+    async def add_segment(self, seg_file, start_time, end_time, segment_text):
+        async with self.changed:
+            self.segments.append({"index": len(self.segments), "start_time": start_time, "end_time": end_time,
+                                  "text": segment_text, "file": seg_file})
+            self.changed.notify_all()
+
+    def iter_pieces(self):
+        while True:
+            piece = self.pieces.get()
+            if piece is None:
+                return
+            yield piece
+
+    def describe(self):
+        submitted = self.times["submitted"]
+        return {
+            "id": self.id,
+            "premise": self.premise,
+            "status": self.status,
+            "error": self.error,
+            "progress": {
+                "generated_chars": self.generated_chars,
+                "segments": len(self.segments),
+                "audio_ms": self.segments[-1]["end_time"] if self.segments else 0,
+            },
+            "timings": {status: round(moment - submitted, 3) for status, moment in self.times.items()
+                        if status != "submitted"},
+            "story": self.story,
+            "usage": self.usage,
+        }
+
+class NarrationService:
+    """
+    The job queue and the two worker pools. llm_workers asyncio tasks take jobs from
+    the bounded queue and stream their stories; tts_workers threads, each owning a
+    narrator, synthesize the pieces as they arrive. A job is handed to the narration
+    stage before its generation starts, through a queue of at most tts_workers
+    waiting jobs, so a slow narration stage holds back generation and, through the
+    full job queue, new submissions.
+
+    pyttsx3.init returns one engine per process, so with the real engine and more
+    than one TTS worker, each narrator renders in processes of its own: render_workers
+    is raised to at least 2.
+    """
+    def __init__(self, llm_workers=4, tts_workers=1, queue_size=32, model=None, engine_factory=None,
+                 render_workers=1):
+        self.llm_workers = llm_workers
+        self.tts_workers = tts_workers
+        self.model = model
+        self.engine_factory = engine_factory
+        if engine_factory is None and tts_workers > 1:
+            # Narrator threads must not share the process's engine (see above).
+            render_workers = max(render_workers, 2)
+        self.render_workers = render_workers
+        self.jobs = OrderedDict()
+        self.queue = asyncio.Queue(queue_size)
+        self.synthesis_queue = asyncio.Queue(tts_workers)
+        self.executor = ThreadPoolExecutor(tts_workers, thread_name_prefix="tts")
+        self.narrators = []
+        self.tasks = []
+        self.counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+
+    async def start(self):
+        from voice_generator import VoiceNarrator
+        loop = asyncio.get_running_loop()
+        options = {"workers": self.render_workers}
+        if self.engine_factory is not None:
+            options["engine_factory"] = self.engine_factory
+        for _ in range(self.tts_workers):
+            narrator = await loop.run_in_executor(self.executor, lambda: VoiceNarrator(**options))
+            self.narrators.append(narrator)
+        self.tasks = [asyncio.create_task(self.generation_worker()) for _ in range(self.llm_workers)]
+        self.tasks += [asyncio.create_task(self.synthesis_worker(narrator)) for narrator in self.narrators]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for narrator in self.narrators:
+            narrator.close()
+
+    def submit(self, premise, fresh=False):
+        """Queues a job; returns None when the queue is full."""
+        job = Job(premise, fresh)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            return None
+        self.counts["submitted"] += 1
+        self.jobs[job.id] = job
+        return job
+
+    async def generation_worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                # Waits while the narration stage is backed up; this is what pushes back on submissions.
+                await self.synthesis_queue.put(job)
+                await self.generate(job)
+            except asyncio.CancelledError:
+                job.pieces.put(None)
+                raise
+            except Exception as e:
+                job.pieces.put(None)
+                await self.fail(job, f"Generation failed: {e}")
+
+    async def generate(self, job):
+        await job.update(status="generating")
+        client = client_for(self.model)
+        # Every LLM worker may have a request in flight on the shared client.
+        client.ensure_concurrency(self.llm_workers)
+        key = GenerationCache.key(job.premise, client.model)
+        cached = None if job.fresh else generation_cache.get(key)
+        # Identical jobs in flight share one request: the first one generates (and
+        # feeds the cache), the others follow its chunks.
+        leader, in_flight = False, None
+        if not job.fresh and cached is None:
+            leader, in_flight = generation_cache.begin(key)
+        splitter = SegmentSplitter()
+        received = []
+
+        async def chunks():
+            if cached is not None:
+                yield cached
+                return
+            if in_flight is not None and not leader:
+                followed = False
+                async for chunk in in_flight.stream():
+                    followed = True
+                    yield chunk
+                error = in_flight.exception()
+                if error is None:
+                    return
+                if followed:
+                    yield f"{ERROR_PREFIX} {error}"
+                    return
+                # The job we followed was abandoned before any text; generate without the cache.
+            async for chunk in client.stream(job.premise):
+                if leader:
+                    in_flight.add(chunk)
+                yield chunk
+
+        try:
+            async for chunk in chunks():
+                if is_error(chunk):
+                    if leader:
+                        generation_cache.finish(key, chunk)
+                    job.pieces.put(None)
+                    await self.fail(job, chunk)
+                    return
+                received.append(chunk)
+                for piece in splitter.feed(chunk):
+                    job.pieces.put(piece)
+                job.generated_chars += len(chunk)
+        except BaseException as e:
+            if leader:
+                generation_cache.abandon(key, RuntimeError(f"Generation abandoned: {e!r}"))
+            raise
+        story = "".join(received)
+        if leader:
+            generation_cache.finish(key, story)
+        for piece in splitter.flush():
+            job.pieces.put(piece)
+        job.pieces.put(None)
+        await job.update(status="narrating", story=story)
+
+    async def synthesis_worker(self, narrator):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.synthesis_queue.get()
+            try:
+                final_file, usage = await loop.run_in_executor(self.executor, self.narrate, narrator, job, loop)
+            except Exception as e:
+                await self.fail(job, f"Narration failed: {e}")
+                continue
+            if job.status == "failed":
+                self.discard(final_file)
+                continue
+            self.counts["done"] += 1
+            await job.update(status="done", final_file=final_file, usage=usage)
+            self.forget_old_jobs()
+
+    def narrate(self, narrator, job, loop):
+        """Runs on a TTS thread: narrates the job's pieces as they arrive."""
+        def on_segment(seg_file, start_time, end_time, segment_text):
+            asyncio.run_coroutine_threadsafe(job.add_segment(seg_file, start_time, end_time, segment_text), loop)
+
+        final_file, _ = narrator.save_stream_to_temp_file(job.iter_pieces(), on_segment)
+        return final_file, dict(narrator.last_usage or {})
+
+    async def fail(self, job, error):
+        if job.status != "failed":
+            self.counts["failed"] += 1
+            await job.update(status="failed", error=error)
+            self.forget_old_jobs()
+
+    def discard(self, final_file):
+        workspace = self.narrators[0].workspace if self.narrators else None
+        if workspace is not None and final_file:
+            workspace.discard(os.path.dirname(final_file))
+
+    def forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
+            self.discard(job.final_file)
+
+    def health(self):
+        return {
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "llm_workers": self.llm_workers,
+            "tts_workers": self.tts_workers,
+            "jobs": dict(self.counts),
+        }
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+async def read_request(reader):
+    """Parses an HTTP/1.1 request; returns (method, path, body) or None at end of stream."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+        if length < 0:
+            raise ValueError(length)
+    except ValueError:
+        raise HTTPError(400, "Malformed Content-Length header.")
+    if length:
+        body = await reader.readexactly(length)
+    return method, path.split("?", 1)[0], body
+
+def response_head(status, content_type, length=None, headers=None):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def send_json(writer, status, payload, headers=None):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(response_head(status, "application/json", len(body), headers) + body)
+    await writer.drain()
+
+class Server:
+    """The HTTP front end of a NarrationService. One request per connection."""
+    routes = [
+        ("POST", re.compile(r"^/jobs$"), "create_job"),
+        ("GET", re.compile(r"^/jobs/(\w+)$"), "job_status"),
+        ("GET", re.compile(r"^/jobs/(\w+)/segments$"), "stream_segments"),
+        ("GET", re.compile(r"^/jobs/(\w+)/segments/(\d+)$"), "segment_audio"),
+        ("GET", re.compile(r"^/jobs/(\w+)/audio$"), "job_audio"),
+        ("GET", re.compile(r"^/health$"), "health"),
+    ]
+
+    def __init__(self, service):
+        self.service = service
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await self.dispatch(writer, *request)
+        except HTTPError as e:
+            await send_json(writer, e.status, {"error": str(e)}, e.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, writer, method, path, body):
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            allowed = True
+            if route_method == method:
+                return await getattr(self, handler)(writer, body, *match.groups())
+        if allowed:
+            raise HTTPError(405, f"{method} is not allowed on {path}.")
+        raise HTTPError(404, f"No route for {path}.")
+
+    def job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown job {job_id}.")
+        return job
+
+    async def create_job(self, writer, body):
+        try:
+            request = json.loads(body or b"{}")
+            premise = request["premise"].strip()
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise HTTPError(400, 'Expected a JSON body like {"premise": "..."}.')
+        if not premise:
+            raise HTTPError(400, "The premise is empty.")
+        fresh = request.get("fresh", False)
+        if not isinstance(fresh, bool):
+            raise HTTPError(400, '"fresh" must be true or false.')
+        job = self.service.submit(premise, fresh)
+        if job is None:
+            raise HTTPError(429, "The job queue is full; retry later.", {"Retry-After": "1"})
+        await send_json(writer, 202, {"id": job.id, "status": job.status})
+
+    async def job_status(self, writer, body, job_id):
+        await send_json(writer, 200, self.job(job_id).describe())
+
+    async def stream_segments(self, writer, body, job_id):
+        """One JSON line per segment, sent as segments become available, then a final status line."""
+        job = self.job(job_id)
+        writer.write(response_head(200, "application/x-ndjson"))
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: len(job.segments) > sent or job.finished)
+                segments = job.segments[sent:]
+                finished = job.finished
+            for segment in segments:
+                line = {key: value for key, value in segment.items() if key != "file"}
+                line["url"] = f"/jobs/{job.id}/segments/{segment['index']}"
+                writer.write(json.dumps(line).encode("utf-8") + b"\n")
+            sent += len(segments)
+            await writer.drain()
+            if finished and sent == len(job.segments):
+                writer.write(json.dumps({"status": job.status, "error": job.error}).encode("utf-8") + b"\n")
+                await writer.drain()
+                return
+
+    async def segment_audio(self, writer, body, job_id, index):
+        job = self.job(job_id)
+        index = int(index)
+        if index >= len(job.segments):
+            raise HTTPError(404, f"Segment {index} of job {job_id} is not available.")
+        await self.send_file(writer, job.segments[index]["file"])
+
+    async def job_audio(self, writer, body, job_id):
+        job = self.job(job_id)
+        if job.final_file is None:
+            raise HTTPError(404, f"The narration of job {job_id} is not ready.")
+        await self.send_file(writer, job.final_file)
+
+    async def send_file(self, writer, path):
+        try:
+            data = await asyncio.to_thread(read_bytes, path)
+        except FileNotFoundError:
+            raise HTTPError(404, "The audio file is no longer available.")
+        content_type = "audio/wav" if path.endswith(".wav") else "application/octet-stream"
+        writer.write(response_head(200, content_type, len(data)) + data)
+        await writer.drain()
+
+    async def health(self, writer, body):
+        await send_json(writer, 200, self.service.health())
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+async def serve(args):
+    model = engine_factory = None
+    if args.stub_llm:
+        from fakes import FakeStreamingModel
+        model = FakeStreamingModel(first_chunk_latency=args.stub_latency)
+    if args.fake_tts:
+        from fakes import fake_engine
+        engine_factory = fake_engine
+    service = NarrationService(args.llm_workers, args.tts_workers, args.queue_size, model, engine_factory,
+                               args.render_workers)
+    await service.start()
+    server = await asyncio.start_server(Server(service).handle, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"({args.llm_workers} LLM workers, {args.tts_workers} TTS workers, queue of {args.queue_size})", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--llm-workers", type=int, default=4, help="concurrent story generations")
+    parser.add_argument("--tts-workers", type=int, default=1, help="concurrent narrations (one narrator each)")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="render processes per narrator (at least 2 with the real engine and several TTS workers)")
+    parser.add_argument("--queue-size", type=int, default=32, help="jobs waiting before submissions get 429")
+    parser.add_argument("--stub-llm", action="store_true", help="use the local fake model instead of Gemini")
+    parser.add_argument("--stub-latency", type=float, default=0.8, help="fake model time to first chunk")
+    parser.add_argument("--fake-tts", action="store_true", help="use the fake TTS engine instead of pyttsx3")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,32 @@
 import os
-import google.generativeai as genai
 import re
 import time
+import hashlib
+import random
+import queue
+import asyncio
+import weakref
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from dotenv import load_dotenv 
+from tracing import span
+from cancellation import CANCEL_POLL_INTERVAL, check_cancelled
+from segment_scheduler import SENTENCE_END_PATTERN
+
+MODEL_NAME = 'gemini-1.5-flash'
+ERROR_PREFIX = "Error generating text:"
+
+CUE_PATTERN = re.compile(r'\[[^\]]*\]')
+
+def import_genai():
+    """
+    Imports google.generativeai on first use. It is by far the heaviest import in the
+    app, so keeping it off module import lets the window (and offline tools using the
+    fakes) start without paying for it.
+    """
+    import google.generativeai as genai
+    return genai
 
 def load_api_key():
     """Load the Gemini API key from the ../assets/.env file."""
@@ -13,13 +37,10 @@ def load_api_key():
         raise ValueError("Error: GEMINI_API_KEY is missing from the .env file.")
     return api_key
 
-def enhance_prompt(user_premise):
-    """Enhance the user's premise with additional creative instructions and voice modulation cues."""
-    enhanced_prompt = f"""
-Create an engaging and original short story based on the following premise. 
-While generating the story, insert clear bracketed instructions for voice modulation at appropriate moments. 
-These instructions should be in square brackets and will guide the narration. For example:
-
+# Static part of the story prompt. GeminiClient sends it once as the model's system
+# instruction, so each request only carries the premise.
+# The cue vocabulary the model is shown; dungeon turns use it too.
+CUE_EXAMPLES = """
 - For calm, reflective scenes or settings, insert [SOFT REFLECTIVE TONE] or [SLOWER PACE].
 - For dialogue or conversational moments, insert [CONVERSATIONAL TONE] or [DIALOGUE VOICE].
 - For action sequences or dramatic moments, include cues like [FASTER PACE], [ENERGETIC TONE], or [INCREASED VOLUME].
@@ -28,56 +49,608 @@ These instructions should be in square brackets and will guide the narration. Fo
 - For climactic, suspenseful, or high-stakes sequences, add [THRILLING].
 - For moments of suspense or surprise, also consider adding [TENSE TREMBLING TONE] or [PAUSE LONGER].
 - Include [PAUSE] directives where natural breaks would occur.
+"""
 
-Premise:
-"{user_premise}"
+STORY_INSTRUCTIONS = """
+Create an engaging and original short story based on the following premise. 
+While generating the story, insert clear bracketed instructions for voice modulation at appropriate moments. 
+These instructions should be in square brackets and will guide the narration. For example:
+""" + CUE_EXAMPLES
 
+STORY_REQUIREMENTS = """
 The final story should have a clear beginning, middle, and end; vivid descriptions of the setting and atmosphere; well-developed characters; meaningful dialogue; and an unexpected twist. 
 The story should be approximately 500-800 words and include these bracketed modulation instructions naturally throughout the narrative.
 """
+
+SYSTEM_INSTRUCTION = STORY_INSTRUCTIONS.strip("\n") + "\n\n" + STORY_REQUIREMENTS.strip("\n")
+
+def premise_prompt(user_premise):
+    """The per-request part of the story prompt."""
+    return f'Premise:\n"{user_premise}"'
+
+# Part of every generation cache key: a hash of the prompt actually sent (system
+# instruction and premise template), so stories from an edited prompt are never reused.
+PROMPT_TEMPLATE_VERSION = hashlib.sha256(
+    (SYSTEM_INSTRUCTION + premise_prompt("{premise}")).encode("utf-8")
+).hexdigest()[:12]
+
+def enhance_prompt(user_premise):
+    """
+    The whole story prompt as one string, for the one-shot generate_text path
+    (benchmark.py compares it with GeminiClient, which sends the instructions as
+    the system instruction instead).
+    """
+    with span("story.enhance_prompt"):
+        enhanced_prompt = f"{STORY_INSTRUCTIONS}\n{premise_prompt(user_premise)}\n{STORY_REQUIREMENTS}"
     return enhanced_prompt
 
 
-def generate_text(prompt):
+def generate_text(prompt, model=None):
     """Generate a story using the Gemini API."""
-    api_key = load_api_key()
-    genai.configure(api_key=api_key)
+    if model is None:
+        genai = import_genai()
+        api_key = load_api_key()
+        genai.configure(api_key=api_key)
     
+    with span("story.generate_text", prompt_chars=len(prompt)) as trace:
+        try:
+            if model is None:
+                model = genai.GenerativeModel(MODEL_NAME)
+            response = model.generate_content(prompt)
+            return response.text
+        except Exception as e:
+            trace.set(error=type(e).__name__)
+            return f"{ERROR_PREFIX} {e}"
+
+def generate_text_stream(prompt, model=None):
+    """
+    Generate a story using the Gemini API, yielding text chunks as they arrive
+    instead of waiting for the whole completion. A model object exposing
+    generate_content(prompt, stream=True) can be passed in (e.g. a local fake).
+    """
+    if model is None:
+        genai = import_genai()
+        api_key = load_api_key()
+        genai.configure(api_key=api_key)
+
+    with span("story.generate_text_stream", prompt_chars=len(prompt)) as trace:
+        try:
+            if model is None:
+                model = genai.GenerativeModel(MODEL_NAME)
+            start = time.perf_counter()
+            first = True
+            for chunk in model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    if first:
+                        trace.set(first_chunk_ms=round((time.perf_counter() - start) * 1000, 3))
+                        first = False
+                    yield chunk.text
+        except Exception as e:
+            trace.set(error=type(e).__name__)
+            yield f"{ERROR_PREFIX} {e}"
+
+class GenerationCancelled(Exception):
+    """Raised by a generation whose cancel event was set; its request has been cancelled."""
+
+def wait_result(future, cancel=None):
+    """future.result(), checking the cancel event while it waits."""
+    while True:
+        check_cancelled(cancel, GenerationCancelled)
+        try:
+            return future.result(CANCEL_POLL_INTERVAL if cancel is not None else None)
+        except FutureTimeout:
+            pass
+
+def next_chunk(chunks, cancel=None):
+    """chunks.get(), checking the cancel event while it waits."""
+    while True:
+        check_cancelled(cancel, GenerationCancelled)
+        try:
+            return chunks.get(timeout=CANCEL_POLL_INTERVAL if cancel is not None else None)
+        except queue.Empty:
+            pass
+
+class TransientError(Exception):
+    """A failed request that is worth retrying (timeouts, rate limits, server errors)."""
+
+def is_transient(error):
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, TransientError)):
+        return True
+    # google.api_core errors carry the HTTP status in .code
+    return getattr(error, 'code', None) in (408, 429, 500, 502, 503, 504)
+
+class GeminiClient:
+    """
+    Long-lived Gemini client. The API key is loaded and the model configured once,
+    with system_instruction (by default the static story instructions) installed as
+    the model's system instruction, so each request only carries the premise.
+
+    All requests run on the client's own event loop thread, so at most
+    max_concurrency of them are in flight no matter how many threads or loops call
+    in. Every attempt has a timeout, and transient failures are retried with
+    exponential backoff and jitter. generate()/stream() are the asyncio API;
+    generate_sync()/stream_sync() serve plain threads (StoryWorker, the batch runner).
+    Like generate_text, failures come back as an error string instead of raising.
+    """
+    def __init__(self, model=None, model_name=MODEL_NAME, max_concurrency=4, timeout=60.0,
+                 retries=3, backoff=1.0, max_backoff=30.0, system_instruction=SYSTEM_INSTRUCTION):
+        if model is None:
+            genai = import_genai()
+            genai.configure(api_key=load_api_key())
+            model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.loop = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+
+    def ensure_concurrency(self, concurrency):
+        """
+        Raises max_concurrency to at least concurrency, for a pool of that many workers
+        sharing the client (the service, the batch runner). The limit is never lowered.
+        """
+        with self.lock:
+            extra = concurrency - self.max_concurrency
+            if extra <= 0:
+                return
+            self.max_concurrency = concurrency
+            if self.semaphore is not None:
+                for _ in range(extra):
+                    self.loop.call_soon_threadsafe(self.semaphore.release)
+
+    def delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def start(self):
+        """Starts the client's event loop thread (done lazily on the first request)."""
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.semaphore = asyncio.Semaphore(self.max_concurrency)
+                threading.Thread(target=self.loop.run_forever, name="gemini-client", daemon=True).start()
+        return self.loop
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.start())
+
+    async def generate(self, premise):
+        """Generates a story for the premise."""
+        return await asyncio.wrap_future(self.submit(self._generate(premise_prompt(premise))))
+
+    async def stream(self, premise):
+        """
+        Yields story chunks as they arrive. Failures before the first chunk are retried;
+        once text has been yielded, a failure ends the stream with an error string.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        pump = self.submit(self._pump(premise_prompt(premise),
+                                      lambda chunk: loop.call_soon_threadsafe(chunks.put_nowait, chunk)))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            pump.cancel()
+
+    def generate_sync(self, premise, cancel=None):
+        """
+        Blocking counterpart of generate(). Setting the cancel event (a threading.Event)
+        cancels the request, releasing its concurrency slot, and raises GenerationCancelled.
+        """
+        return self.complete_sync(premise_prompt(premise), cancel)
+
+    def complete_sync(self, prompt, cancel=None):
+        """Like generate_sync, for a complete prompt instead of a premise."""
+        future = self.submit(self._generate(prompt))
+        try:
+            return wait_result(future, cancel)
+        finally:
+            future.cancel()
+
+    def stream_sync(self, premise, cancel=None):
+        """
+        Blocking counterpart of stream() for callers on plain threads. Setting the
+        cancel event cancels the request and raises GenerationCancelled.
+        """
+        return self.stream_prompt_sync(premise_prompt(premise), cancel)
+
+    def stream_prompt_sync(self, prompt, cancel=None):
+        """Like stream_sync, for a complete prompt instead of a premise."""
+        chunks = queue.Queue()
+        pump = self.submit(self._pump(prompt, chunks.put))
+        try:
+            while True:
+                chunk = next_chunk(chunks, cancel)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            pump.cancel()
+
+    async def _generate(self, prompt):
+        async with self.semaphore:
+            with span("gemini.generate") as trace:
+                for attempt in range(self.retries + 1):
+                    trace.set(attempts=attempt + 1)
+                    try:
+                        response = await asyncio.wait_for(self.model.generate_content_async(prompt), self.timeout)
+                        return response.text
+                    except Exception as e:
+                        if attempt == self.retries or not is_transient(e):
+                            trace.set(error=type(e).__name__)
+                            return f"{ERROR_PREFIX} {e}"
+                    await asyncio.sleep(self.delay(attempt))
+
+    async def _pump(self, prompt, put):
+        """Streams the response to prompt into put(chunk), then put(None)."""
+        try:
+            async with self.semaphore:
+                with span("gemini.stream") as trace:
+                    start = time.perf_counter()
+                    for attempt in range(self.retries + 1):
+                        trace.set(attempts=attempt + 1)
+                        received = False
+                        try:
+                            response = await asyncio.wait_for(
+                                self.model.generate_content_async(prompt, stream=True), self.timeout)
+                            iterator = response.__aiter__()
+                            while True:
+                                try:
+                                    chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                                except StopAsyncIteration:
+                                    return
+                                if chunk.text:
+                                    if not received:
+                                        trace.set(first_chunk_ms=round((time.perf_counter() - start) * 1000, 3))
+                                    received = True
+                                    put(chunk.text)
+                        except Exception as e:
+                            if received or attempt == self.retries or not is_transient(e):
+                                trace.set(error=type(e).__name__)
+                                put(f"{ERROR_PREFIX} {e}")
+                                return
+                        await asyncio.sleep(self.delay(attempt))
+        finally:
+            put(None)
+
+_clients = {}
+_client_lock = threading.Lock()
+
+def get_client(system_instruction=SYSTEM_INSTRUCTION):
+    """
+    The process-wide GeminiClient for a system instruction (the story instructions
+    by default, None for none), created (and configured) on first use.
+    """
+    with _client_lock:
+        client = _clients.get(system_instruction)
+        if client is None:
+            client = _clients[system_instruction] = GeminiClient(system_instruction=system_instruction)
+        return client
+
+_model_clients = weakref.WeakKeyDictionary()
+
+def client_for(model=None, system_instruction=SYSTEM_INSTRUCTION):
+    """
+    The shared client for system_instruction, or a dedicated (reused) one around
+    model, e.g. a local fake, which comes with its own system instruction, if any.
+    """
+    if model is None:
+        return get_client(system_instruction)
+    with _client_lock:
+        client = _model_clients.get(model)
+        if client is None:
+            client = _model_clients[model] = GeminiClient(model=model)
+        return client
+
+def is_error(text):
+    """True for the error strings generate_text/generate_text_stream return instead of a story."""
+    return text.startswith(ERROR_PREFIX)
+
+class InFlightStory:
+    """
+    A story being generated by the first caller of GenerationCache.begin() for a key
+    (the leader), which reports its chunks with add(). Other callers wait for the
+    complete result(), or follow() the chunks: those received so far are replayed,
+    later ones forwarded as they arrive, then None marks the end.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.listeners = []
+        self.done = False
+        self.future = Future()
+        self.lock = threading.Lock()
+
+    def add(self, chunk):
+        with self.lock:
+            self.chunks.append(chunk)
+            for put in self.listeners:
+                put(chunk)
+
+    def follow(self, put):
+        """Calls put(chunk) for every chunk, then put(None). put must not block."""
+        with self.lock:
+            for chunk in self.chunks:
+                put(chunk)
+            if self.done:
+                put(None)
+            else:
+                self.listeners.append(put)
+
+    def stream_sync(self, cancel=None):
+        """Yields the chunks as they arrive, for callers on plain threads."""
+        chunks = queue.Queue()
+        self.follow(chunks.put)
+        while True:
+            chunk = next_chunk(chunks, cancel)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def stream(self):
+        """Asyncio counterpart of stream_sync."""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        self.follow(lambda chunk: loop.call_soon_threadsafe(chunks.put_nowait, chunk))
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def result(self, cancel=None):
+        return wait_result(self.future, cancel)
+
+    def exception(self):
+        """The error the leader abandoned the generation with, or None; call once it has ended."""
+        return self.future.exception()
+
+    def set_result(self, story):
+        self.future.set_result(story)
+        with self.lock:
+            # A leader that did not stream hands followers the whole story as one chunk.
+            if not self.chunks:
+                self.chunks.append(story)
+                for put in self.listeners:
+                    put(story)
+            self.end()
+
+    def set_exception(self, error):
+        self.future.set_exception(error)
+        with self.lock:
+            self.end()
+
+    def end(self):
+        self.done = True
+        for put in self.listeners:
+            put(None)
+        self.listeners = []
+
+class GenerationCache:
+    """
+    In-memory cache of generated stories keyed on the normalized premise, the prompt
+    template version and the model name. Entries expire after ttl seconds and the
+    least recently used ones are dropped beyond max_entries. Concurrent requests for
+    the same key coalesce: the first caller generates, the others wait for its result
+    or follow its chunks as they arrive (see InFlightStory).
+    Error strings are handed to waiting callers but never stored.
+    """
+    def __init__(self, ttl=3600, max_entries=128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(premise, model=None):
+        model_name = getattr(model, 'model_name', MODEL_NAME) if model is not None else MODEL_NAME
+        normalized = " ".join(premise.split()).casefold()
+        return (normalized, PROMPT_TEMPLATE_VERSION, model_name)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            story, expires = entry
+            if time.monotonic() >= expires:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return story
+
+    def put(self, key, story):
+        if not story or is_error(story):
+            return
+        with self.lock:
+            self.entries[key] = (story, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def begin(self, key):
+        """
+        Registers a generation for key. Returns (True, story) if the caller should
+        generate, reporting chunks with story.add() if it streams, and then call
+        finish() or abandon(); or (False, story) if an identical request is already
+        in flight and the caller should wait on or follow story (an InFlightStory).
+        """
+        with self.lock:
+            story = self.in_flight.get(key)
+            if story is not None:
+                return False, story
+            story = self.in_flight[key] = InFlightStory()
+            return True, story
+
+    def finish(self, key, story):
+        self.put(key, story)
+        with self.lock:
+            in_flight = self.in_flight.pop(key, None)
+        if in_flight is not None:
+            in_flight.set_result(story)
+
+    def abandon(self, key, error):
+        with self.lock:
+            in_flight = self.in_flight.pop(key, None)
+        if in_flight is not None:
+            in_flight.set_exception(error)
+
+    def get_or_generate(self, key, generate, cancel=None):
+        story = self.get(key)
+        if story is not None:
+            return story
+        leader, in_flight = self.begin(key)
+        if not leader:
+            try:
+                return in_flight.result(cancel)
+            except Exception:
+                # Only our own cancellation ends here; if the request we waited on was
+                # abandoned (e.g. its caller cancelled it), generate without the cache.
+                check_cancelled(cancel, GenerationCancelled)
+            return generate()
+        try:
+            story = generate()
+        except BaseException as e:
+            self.abandon(key, e)
+            raise
+        self.finish(key, story)
+        return story
+
+generation_cache = GenerationCache(
+    ttl=float(os.getenv("STORY_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("STORY_CACHE_SIZE", "128"))
+)
+
+def generate_story(premise, fresh=False, model=None, cancel=None):
+    """
+    Generates a story for the premise, served from the generation cache when the same
+    premise was generated recently. fresh=True bypasses the cache for a new variation.
+    Requests go through the shared GeminiClient (or a client around model, if given).
+    Setting the cancel event cancels the request and raises GenerationCancelled.
+    """
+    client = client_for(model)
+    generate = lambda: client.generate_sync(premise, cancel)
+    if fresh:
+        return generate()
+    return generation_cache.get_or_generate(GenerationCache.key(premise, client.model), generate, cancel)
+
+def generate_story_stream(premise, fresh=False, model=None, cancel=None):
+    """
+    Streaming counterpart of generate_story. A cached story is yielded as a single
+    chunk; an identical request already in flight is followed chunk by chunk.
+    """
+    client = client_for(model)
+    if fresh:
+        yield from client.stream_sync(premise, cancel)
+        return
+    key = GenerationCache.key(premise, client.model)
+    story = generation_cache.get(key)
+    if story is not None:
+        yield story
+        return
+    leader, in_flight = generation_cache.begin(key)
+    if not leader:
+        received = False
+        for chunk in in_flight.stream_sync(cancel):
+            received = True
+            yield chunk
+        error = in_flight.exception()
+        if error is not None:
+            if received:
+                # Part of the story is out already; like a failed stream, end with an error.
+                yield f"{ERROR_PREFIX} {error}"
+            else:
+                # The request we waited on was abandoned; generate without the cache.
+                yield from client.stream_sync(premise, cancel)
+        return
+
+    chunks = []
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error generating text: {e}"
+        for chunk in client.stream_sync(premise, cancel):
+            chunks.append(chunk)
+            in_flight.add(chunk)
+            yield chunk
+    except BaseException as e:
+        generation_cache.abandon(key, RuntimeError(f"Generation abandoned: {e!r}"))
+        raise
+    error = next((chunk for chunk in chunks if is_error(chunk)), None)
+    generation_cache.finish(key, error if error is not None else "".join(chunks))
 
-def parse_story(story):
+class CueStripper:
     """
-    Parses the generated story using [PARAGRAPH] markers instead of newlines.
-    Extracts text and any embedded voice cues.
+    Removes bracketed modulation cues from text that arrives in chunks. A cue that
+    is split across chunks is held back until its closing bracket arrives, so the
+    joined output is identical to stripping the complete story in one go.
     """
-    paragraphs = story.split("[PARAGRAPH]")  # Split based on the special marker
-    parsed_paragraphs = []
+    def __init__(self):
+        self.pending = ""
 
-    for paragraph in paragraphs:
-        # Extract voice tone if present
-        match = re.search(r'\[(TONE:.*?)\]', paragraph)
-        tone = match.group(1) if match else "Default"
-        
-        # Clean the paragraph by removing voice tone markers
-        clean_text = re.sub(r'\[(TONE:.*?)\]', '', paragraph).strip()
-        parsed_paragraphs.append((clean_text, tone))
+    def feed(self, chunk):
+        text = self.pending + chunk
+        start = text.find('[', text.rfind(']') + 1)
+        if start != -1:
+            self.pending = text[start:]
+            text = text[:start]
+        else:
+            self.pending = ""
+        return CUE_PATTERN.sub('', text)
 
-    return parsed_paragraphs
+    def flush(self):
+        # An unterminated bracket at the very end is not a cue; emit it as-is.
+        text, self.pending = self.pending, ""
+        return text
 
-def narrate_story(story):
+class SegmentSplitter:
     """
-    Narrates the story in batches, processing one paragraph at a time.
+    Buffers streamed story text (cues included) and releases it in complete
+    sentences, so narration can start before the full story exists. A piece is
+    never cut inside a cue, and cues after a sentence end travel with the next one.
     """
-    parsed_story = parse_story(story)
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        limit = self.buffer.find('[', self.buffer.rfind(']') + 1)
+        if limit == -1:
+            limit = len(self.buffer)
+        cut = 0
+        for match in SENTENCE_END_PATTERN.finditer(self.buffer, 0, limit):
+            cut = match.end()
+        if cut == 0:
+            return []
+        piece, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return [piece]
+
+    def flush(self):
+        piece, self.buffer = self.buffer, ""
+        return [piece] if piece.strip() else []
 
-    for text, tone in parsed_story:
-        print(f"\nNarrating: {text} (Tone: {tone})")
-        generate_voice(text, tone)  # Use voice synthesis with tone adjustments
-        time.sleep(1)  # Short delay between sections
+def parse_story(story, narrator=None):
+    """
+    Splits a generated story (with modulation cues) into the units the narrator
+    synthesizes: a list of (text, properties) tuples, after cue parsing and
+    segment scheduling (see SegmentScheduler). Uses the shared narrator unless
+    one is given.
+    """
+    from voice_generator import get_shared_narrator
+    narrator = narrator or get_shared_narrator()
+    return list(narrator.schedule_text(story))
+
+def narrate_story(story, narrator=None):
+    """
+    Narrates a generated story to a single audio file, one engine call per
+    scheduled unit. Returns (audio_file, mapping) like VoiceNarrator.save_to_temp_file.
+    """
+    from voice_generator import get_shared_narrator
+    narrator = narrator or get_shared_narrator()
+    return narrator.save_to_temp_file(story)
 
 
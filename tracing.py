@@ -0,0 +1,196 @@
+"""
+Lightweight tracing for the story and narration pipeline.
+
+Set NARRATOR_TRACE_LOG to a file path to enable it. Every span is appended to that
+file as one JSON object per line:
+
+    {"span": "narrate.synthesize", "ms": 412.7, "start": 1718000000.123,
+     "session": "3f2a9c1b7e4d", "pid": 4242, "thread": "Dummy-3", "chars": 88}
+
+When the variable is unset, span() returns a shared no-op object, so the cost of an
+instrumented call is one attribute check and two empty method calls.
+
+    python tracing.py histogram [trace.jsonl]
+
+aggregates the spans of every session in a log into per-stage latency histograms.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+
+TRACE_LOG = os.getenv("NARRATOR_TRACE_LOG")
+
+class _NullSpan:
+    """Stand-in returned by a disabled tracer; every operation is a no-op."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """A timed region of work; extra attributes can be attached with set()."""
+    __slots__ = ('tracer', 'name', 'attrs', 'start')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer.record(self.name, elapsed, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Tracer:
+    """
+    Writes spans to a JSON-lines log and keeps per-session totals for a short summary.
+    A session groups the spans of one story (begin_session starts a new one); spans
+    recorded in narration worker processes go to the same log, tagged with their pid.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = path is not None
+        self.lock = threading.Lock()
+        self.file = None
+        self.pid = None
+        self.session = None
+        self.totals = {}
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def begin_session(self, **attrs):
+        """Starts a new session and returns its id; the summary totals are reset."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            self.session = uuid.uuid4().hex[:12]
+            self.totals = {}
+        self._write({"event": "session", "start": time.time(), **attrs})
+        return self.session
+
+    def record(self, name, seconds, attrs):
+        with self.lock:
+            count, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (count + 1, total + seconds)
+        self._write({"span": name, "ms": round(seconds * 1000, 3),
+                     "start": round(time.time() - seconds, 6), **attrs})
+
+    def summary(self):
+        """One line of per-stage totals for the current session, e.g. for the status bar."""
+        with self.lock:
+            totals = list(self.totals.items())
+        parts = []
+        for name, (count, seconds) in totals:
+            part = f"{name.split('.')[-1]} {seconds:.2f} s"
+            if count > 1:
+                part += f" ({count}x)"
+            parts.append(part)
+        return ", ".join(parts)
+
+    def _write(self, record):
+        record["session"] = self.session
+        record["pid"] = os.getpid()
+        record["thread"] = threading.current_thread().name
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            # A forked worker process must not share the parent's file object.
+            if self.file is None or self.pid != os.getpid():
+                self.file = open(self.path, "a", encoding="utf-8")
+                self.pid = os.getpid()
+            self.file.write(line)
+            self.file.flush()
+
+tracer = Tracer(TRACE_LOG)
+
+def span(name, **attrs):
+    """Times the enclosed block as a span of the process-wide tracer."""
+    return tracer.span(name, **attrs)
+
+def load_spans(path):
+    """Reads the span records of a trace log, skipping session markers and torn lines."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "span" in record:
+                spans.append(record)
+    return spans
+
+def percentile(sorted_values, fraction):
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def histogram(spans, width=40):
+    """
+    Formats per-span latency statistics and a histogram with power-of-two millisecond
+    buckets, aggregated across every session in spans.
+    """
+    by_name = {}
+    for record in spans:
+        by_name.setdefault(record["span"], []).append(record["ms"])
+    sessions = {record.get("session") for record in spans}
+    lines = [f"{len(spans)} spans across {len(sessions)} session(s)"]
+    for name in sorted(by_name):
+        values = sorted(by_name[name])
+        lines.append("")
+        lines.append(f"{name}: n={len(values)} total={sum(values) / 1000:.2f} s "
+                     f"p50={percentile(values, 0.5):.1f} ms p90={percentile(values, 0.9):.1f} ms "
+                     f"p99={percentile(values, 0.99):.1f} ms max={values[-1]:.1f} ms")
+        buckets = {}
+        for value in values:
+            upper = 1
+            while upper < value:
+                upper *= 2
+            buckets[upper] = buckets.get(upper, 0) + 1
+        peak = max(buckets.values())
+        for upper in sorted(buckets):
+            bar = "#" * max(1, round(width * buckets[upper] / peak))
+            lines.append(f"  <= {upper:>7} ms {buckets[upper]:>6} {bar}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    view = subparsers.add_parser("histogram", help="per-stage latency histograms across sessions")
+    view.add_argument("log", nargs="?", default=TRACE_LOG, help="trace log (default: $NARRATOR_TRACE_LOG)")
+    view.add_argument("--span", action="append", help="only show spans with this name (repeatable)")
+    args = parser.parse_args()
+    if not args.log:
+        parser.error("no trace log given and NARRATOR_TRACE_LOG is not set")
+    spans = load_spans(args.log)
+    if args.span:
+        spans = [record for record in spans if record["span"] in args.span]
+    if not spans:
+        print(f"No spans in {args.log}.")
+        sys.exit(1)
+    print(histogram(spans))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,88 @@
-import re
 import pyttsx3
 import time
 import random
 import tempfile
 import os
+import wave
+import queue
+import threading
+import warnings
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pydub import AudioSegment
+from segment_cache import SegmentCache
+from segment_scheduler import SegmentScheduler
+from workspace import Workspace
+from cue_compiler import CueCompiler
+from tracing import span
+from cancellation import CANCEL_POLL_INTERVAL, check_cancelled
+import dsp
+
+# Number of worker processes used to synthesize segments in parallel (1 = serial).
+DEFAULT_WORKERS = int(os.getenv("NARRATOR_WORKERS", "1"))
+# How cue properties are applied: "dsp" renders neutral speech and modulates the
+# samples afterwards (see dsp.py), "engine" passes them to the TTS engine.
+MODULATION_MODES = ("dsp", "engine")
+DEFAULT_MODULATION = os.getenv("NARRATOR_MODULATION", "dsp")
+
+class NarrationCancelled(Exception):
+    """Raised by a narration whose cancel event was set; its files have been deleted."""
+
+class StreamProgress:
+    """
+    Progress of a narration whose segments are still arriving. read_ahead() pulls the
+    segments on a thread of its own, so the number scheduled so far is known while
+    earlier ones render. on_progress(done, total, complete) is called whenever a
+    segment is scheduled or assembled; complete is True once the segments have run
+    out, i.e. total is final.
+    """
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+        self.done = 0
+        self.total = 0
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def assembled(self, done):
+        with self.lock:
+            self.done = done
+            self.on_progress(self.done, self.total, self.complete)
+
+    def read_ahead(self, segments):
+        ahead = queue.Queue()
+        stopped = threading.Event()
+
+        def read_all():
+            try:
+                for segment in segments:
+                    if stopped.is_set():
+                        return
+                    with self.lock:
+                        self.total += 1
+                        self.on_progress(self.done, self.total, self.complete)
+                    ahead.put((segment, None))
+                with self.lock:
+                    self.complete = True
+                    self.on_progress(self.done, self.total, self.complete)
+            except Exception as e:
+                ahead.put((None, e))
+            finally:
+                ahead.put(None)
+
+        threading.Thread(target=read_all, daemon=True).start()
+        try:
+            while True:
+                item = ahead.get()
+                if item is None:
+                    return
+                segment, error = item
+                if error is not None:
+                    raise error
+                yield segment
+        finally:
+            stopped.set()
 
 class VoiceNarrator:
     """
@@ -12,9 +90,53 @@ class VoiceNarrator:
     instructions. The text is split into segments, each rendered separately with the
     appropriate properties, then concatenated into one file. It also returns a mapping
     of segments for text highlighting.
+
+    With workers > 1, segments are rendered concurrently by a pool of processes that
+    each own their own engine created by engine_factory (which must be picklable).
+    Rendered segments are looked up in and stored to a SegmentCache (the default one
+    when cache is None; pass cache=False to disable it). Cues are interpreted with
+    the given cue table entries, or the default table from cues.json. Narrations are
+    rendered in directories of a Workspace (the default one when workspace is None),
+    which cleans up intermediate files and bounds disk usage; with workspace=False
+    every narration gets a plain temporary directory that is left as is. Parsed
+    segments pass through a SegmentScheduler (the default one when scheduler is
+    None; scheduler=False synthesizes every parsed segment as is), which merges
+    and splits them into the units that are actually synthesized.
+
+    With modulation="dsp" (the default), segments are synthesized with the neutral
+    voice and the cue's rate, pitch and volume are applied to the samples by the
+    DSP stage, independently of what the engine supports. The cache then holds
+    neutral renders, shared by every cue the same text is spoken with. With
+    modulation="engine" the properties are set on the engine instead.
+
+    A narration can be cancelled from another thread by setting the threading.Event
+    passed as cancel. It is checked between segments (and while waiting on a worker
+    process), so at most the segment being synthesized is finished; the narration
+    then deletes its directory and raises NarrationCancelled.
     """
-    def __init__(self):
-        self.engine = pyttsx3.init()
+    def __init__(self, engine_factory=pyttsx3.init, workers=DEFAULT_WORKERS, cache=None, cue_table=None,
+                 workspace=None, modulation=DEFAULT_MODULATION, scheduler=None):
+        if modulation not in MODULATION_MODES:
+            raise ValueError(f"Error: unknown modulation mode '{modulation}'.")
+        self.modulation = modulation
+        self.engine_factory = engine_factory
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+        if cache is None:
+            cache = SegmentCache.from_env()
+        self.cache = cache or None
+        if workspace is None:
+            workspace = Workspace.from_env()
+        self.workspace = workspace or None
+        if scheduler is None:
+            scheduler = SegmentScheduler.from_env()
+        self.scheduler = scheduler or None
+        # Segments synthesized by the engine (cache misses) during the current narration.
+        self.engine_calls = 0
+        # Bytes written and kept on disk, audio length and engine calls of the last narration.
+        self.last_usage = None
+        self.engine = engine_factory()
         self.default_rate = 175
         self.default_volume = 0.8
         self.default_pitch = 100
@@ -24,136 +146,474 @@ class VoiceNarrator:
         self.voices = {voice.id: voice for voice in voices}
         if voices:
             self.engine.setProperty('voice', voices[0].id)
+        self.voice_id = self.engine.getProperty('voice')
+        # The cue vocabulary lives in a table (cues.json) compiled against the defaults.
+        self.cue_compiler = CueCompiler(self.default_properties(), cue_table)
 
-    def parse_modulation_instructions(self, text):
-        """
-        Parses modulation instructions in square brackets and splits the text into segments.
-        Returns a list of (plain_text, properties) tuples.
-        """
-        segments = []
-        current_text = ""
-        current_properties = {
+    def default_properties(self):
+        return {
             'rate': self.default_rate,
             'volume': self.default_volume,
             'pitch': self.default_pitch,
             'pause_before': 0,
             'pause_after': 0
         }
-        pattern = r'\[([^\]]+)\]'
-        parts = re.split(pattern, text)
-        for i, part in enumerate(parts):
-            if i % 2 == 0:
-                current_text += part
-            else:
-                instruction = part.strip().upper()
-                if instruction in ("SOFT TONE", "SOFT REFLECTIVE TONE"):
-                    current_properties['volume'] = 0.7
-                    current_properties['rate'] = self.default_rate - 20
-                elif instruction == "SLOWER PACE":
-                    current_properties['rate'] = self.default_rate - 30
-                elif instruction in ("FASTER PACE", "INCREASE PACE"):
-                    current_properties['rate'] = self.default_rate + 30
-                elif instruction == "ENERGETIC TONE":
-                    current_properties['volume'] = 0.9
-                    current_properties['pitch'] = 110
-                elif instruction in ("INCREASED VOLUME", "INCREASE VOLUME"):
-                    current_properties['volume'] = 0.95
-                elif instruction == "EMPHASIS":
-                    current_properties['pitch'] = 110
-                elif instruction in ("BRIEF PAUSE", "PAUSE"):
-                    current_properties['pause_after'] = 500  # 500 ms
-                elif instruction == "PAUSE BRIEFLY":
-                    current_properties['pause_before'] = 300  # 300 ms
-                elif instruction == "PAUSE LONGER":
-                    current_properties['pause_after'] = 1000  # 1 sec
-                elif instruction == "RISING INTONATION":
-                    current_properties['pitch'] = 115
-                elif instruction == "TENSE TREMBLING TONE":
-                    current_properties['rate'] = self.default_rate - 10
-                    current_properties['pitch'] = 105
-                elif instruction == "BRIGHT UPLIFTED TONE":
-                    current_properties['rate'] = self.default_rate + 10
-                    current_properties['pitch'] = 110
-                    current_properties['volume'] = 0.85
-                elif instruction == "SOMBER HEAVY TONE":
-                    current_properties['rate'] = self.default_rate - 20
-                    current_properties['pitch'] = 90
-                    current_properties['volume'] = 0.75
-                elif instruction == "SHARP INTENSE TONE":
-                    current_properties['rate'] = self.default_rate + 15
-                    current_properties['pitch'] = 105
-                    current_properties['volume'] = 0.9
-                elif instruction in ("DIALOGUE VOICE", "CONVERSATIONAL TONE"):
-                    current_properties['pitch'] = 105
-                    current_properties['rate'] = self.default_rate + 5
-                elif instruction == "EMOTIVE":
-                    current_properties['volume'] = min(current_properties['volume'] + 0.1, 1.0)
-                    current_properties['pitch'] += 5
-                elif instruction == "NATURAL":
-                    current_properties['rate'] = self.default_rate
-                elif instruction == "THRILLING":
-                    current_properties['volume'] = 0.95
-                    current_properties['pitch'] += 10
-                elif instruction in ("SCENE CHANGE", "SHIFT TONE"):
-                    if current_text:
-                        # Append current segment
-                        segments.append((current_text.strip(), dict(current_properties)))
-                        current_text = ""
-                    # Reset properties for new segment with a pause before
-                    current_properties = {
-                        'rate': self.default_rate,
-                        'volume': self.default_volume,
-                        'pitch': self.default_pitch,
-                        'pause_before': 1000,
-                        'pause_after': 0
-                    }
-        if current_text:
-            segments.append((current_text.strip(), dict(current_properties)))
+
+    def parse_modulation_instructions(self, text):
+        """
+        Parses modulation instructions in square brackets and splits the text into segments.
+        Returns a list of (plain_text, properties) tuples.
+        """
+        with span("narrate.parse", chars=len(text)) as trace:
+            segments, _ = self._parse_segments(text, self.default_properties())
+            trace.set(segments=len(segments))
         return segments
 
-    def save_to_temp_file(self, text):
+    def parse_modulation_stream(self, pieces):
+        """
+        Incremental counterpart of parse_modulation_instructions for text that arrives
+        in pieces (e.g. complete sentences of a story that is still being generated).
+        Each piece is closed as its own segment and yielded as soon as it is parsed.
+        Voice properties carry over from one piece to the next; pauses are one-shot.
+        """
+        current_properties = self.default_properties()
+        for piece in pieces:
+            segments, current_properties = self._parse_segments(piece, current_properties)
+            for segment_text, properties in segments:
+                if segment_text:
+                    yield segment_text, properties
+            current_properties['pause_before'] = 0
+            current_properties['pause_after'] = 0
+
+    def _parse_segments(self, text, current_properties):
+        """
+        Parses text starting from the given properties.
+        Returns the segments and the properties in effect at the end of the text.
+        """
+        return self.cue_compiler.parse(text, current_properties)
+
+    def synthesis_properties(self, properties):
+        """The properties a segment is synthesized with: neutral when the DSP stage applies the cue."""
+        if self.modulation != "dsp":
+            return properties
+        return dict(properties, rate=self.default_rate, volume=self.default_volume, pitch=self.default_pitch)
+
+    def modulation_effect(self, properties):
+        """The DSP effect that turns a neutral render into one with the given properties, or None."""
+        if self.modulation != "dsp":
+            return None
+        modulation = dsp.modulation_for(properties, self.default_properties())
+        if modulation is None:
+            return None
+        stretch, pitch, gain = modulation
+        return functools.partial(dsp.modulate, stretch=stretch, pitch=pitch, gain=gain)
+
+    def render_segment(self, segment_text, properties, seg_file):
+        """Renders a single segment to seg_file with the given voice properties."""
+        self.engine.setProperty('rate', properties['rate'])
+        self.engine.setProperty('volume', properties['volume'])
+        try:
+            self.engine.setProperty('pitch', properties['pitch'])
+        except Exception:
+            pass
+        with span("narrate.synthesize", chars=len(segment_text)):
+            self.engine.save_to_file(segment_text, seg_file)
+            self.engine.runAndWait()
+
+    def save_to_temp_file(self, text, cancel=None, on_progress=None):
         """
         Saves the narrated audio (with modulation cues applied) to a temporary WAV file.
         Returns a tuple (final_file, mapping) where mapping is a list of dictionaries,
         each containing 'text', 'start_time', and 'end_time' in milliseconds.
+        on_progress(done, total) is called after each segment is assembled.
+        """
+        units = list(self.schedule_text(text))
+        progress = None
+        if on_progress is not None:
+            progress = lambda done: on_progress(done, len(units))
+        return self._narrate_segments(units, cancel=cancel, on_progress=progress)
+
+    def save_stream_to_temp_file(self, pieces, on_segment=None, cancel=None, on_progress=None):
         """
+        Like save_to_temp_file, but for story text that arrives in pieces. Each segment
+        is synthesized as soon as its piece is complete, and on_segment(seg_file,
+        start_time, end_time, segment_text) is called with a playable file for it
+        (pauses around it included), its span on the narration timeline and its text,
+        so playback can start before the rest of the story is rendered.
+        on_progress(done, total, complete) counts the segments assembled out of those
+        scheduled so far; complete is True once the story has ended (see StreamProgress).
+        """
+        units = self.schedule(self.parse_modulation_stream(pieces))
+        if on_progress is None:
+            return self._narrate_segments(units, on_segment, cancel)
+        progress = StreamProgress(on_progress)
+        return self._narrate_segments(progress.read_ahead(units), on_segment, cancel, progress.assembled)
+
+    def schedule_text(self, text):
+        """The units save_to_temp_file synthesizes for text, as (text, properties) tuples."""
         segments = self.parse_modulation_instructions(text)
-        segment_files = []
+        # Splitting long segments only pays off when the parts render in parallel.
+        return self.schedule(segments, split=self.workers > 1)
+
+    def schedule(self, segments, split=True):
+        """The units to synthesize for parsed segments (see SegmentScheduler)."""
+        if self.scheduler is None:
+            return segments
+        return self.scheduler.schedule(segments, split)
+
+    def _narrate_segments(self, segments, on_segment=None, cancel=None, on_progress=None):
+        # A shared narrator may be asked for two stories at once; its engine is not reentrant.
+        with self.lock, span("narrate.total", workers=self.workers) as trace:
+            # A narration cancelled while it waited for the lock does not start at all.
+            check_cancelled(cancel, NarrationCancelled)
+            final_file, mapping = self._narrate_segments_locked(segments, on_segment, cancel, on_progress)
+            trace.set(segments=len(mapping), **self.last_usage)
+            return final_file, mapping
+
+    def _narrate_segments_locked(self, segments, on_segment, cancel, on_progress):
+        self.engine_calls = 0
+        if self.workspace is None:
+            temp_dir = tempfile.mkdtemp()
+            final_file, mapping, audio_ms = self._assemble(segments, on_segment, temp_dir, cancel, on_progress)
+            self.last_usage = {"audio_ms": audio_ms, "engine_calls": self.engine_calls}
+            return final_file, mapping
+        temp_dir = self.workspace.create()
+        try:
+            final_file, mapping, audio_ms = self._assemble(segments, on_segment, temp_dir, cancel, on_progress)
+        except BaseException:
+            self.workspace.discard(temp_dir)
+            raise
+        # Segment files handed to on_segment may still be playing; the caller releases them.
+        final_file, usage = self.workspace.finish(temp_dir, final_file, keep_intermediates=on_segment is not None)
+        self.last_usage = dict(usage, audio_ms=audio_ms, engine_calls=self.engine_calls)
+        return final_file, mapping
+
+    def _assemble(self, segments, on_segment, temp_dir, cancel=None, on_progress=None):
+        """Renders segments into temp_dir and assembles them; returns (final_file, mapping, audio_ms)."""
         mapping = []
         current_time = 0
-        temp_dir = tempfile.mkdtemp()
+        if self.workers > 1:
+            rendered = self._render_parallel(segments, temp_dir, cancel)
+        else:
+            rendered = self._render_serial(segments, temp_dir, cancel)
+        final_file = os.path.join(temp_dir, "final_narration.wav")
+        with WavAssembler(final_file) as assembler:
+            for i, segment_text, properties, seg_file in rendered:
+                effect = self.modulation_effect(properties)
+                frames = assembler.add_file(seg_file, effect, properties['pause_before'])
+                lead = assembler.silence(properties['pause_before']) if properties['pause_before'] > 0 else b""
+                # Times come from the frames written so far, so they never drift from the audio.
+                # The play file covers the leading pause; the mapping starts where speech does.
+                segment_start = current_time
+                mapping.append({
+                    "text": segment_text,
+                    "start_time": assembler.position_ms(len(frames)),
+                    "end_time": assembler.position_ms()
+                })
+                silence = b""
+                if properties['pause_after'] > 0:
+                    silence = assembler.add_silence(properties['pause_after'])
+                current_time = assembler.position_ms()
+                if on_segment is not None:
+                    play_file = seg_file
+                    if lead or silence or effect is not None:
+                        play_file = os.path.join(temp_dir, f"segment_{i}_play.wav")
+                        assembler.write_copy(play_file, lead + frames + silence)
+                    on_segment(play_file, segment_start, current_time, segment_text)
+                if on_progress is not None:
+                    on_progress(len(mapping))
+        # A cancelled story stream simply ends; its partial narration is not kept either.
+        check_cancelled(cancel, NarrationCancelled)
+        return final_file, mapping, current_time
+
+    def cache_key(self, segment_text, properties):
+        factory = getattr(self.engine_factory, 'func', self.engine_factory)  # unwrap functools.partial
+        engine = f"{factory.__module__}.{factory.__qualname__}"
+        return SegmentCache.key(segment_text, self.voice_id, properties, engine)
+
+    def _fetch_cached(self, segment_text, properties, seg_file):
+        """Copies a cached render of the segment to seg_file; returns its cache key on a miss."""
+        if self.cache is None:
+            return None
+        with span("narrate.cache_lookup") as trace:
+            key = self.cache_key(segment_text, properties)
+            hit = self.cache.get(key, seg_file)
+            trace.set(hit=hit)
+        if hit:
+            return None
+        return key
+
+    def _render_serial(self, segments, temp_dir, cancel=None):
         for i, (segment_text, properties) in enumerate(segments):
+            check_cancelled(cancel, NarrationCancelled)
             seg_file = os.path.join(temp_dir, f"segment_{i}.wav")
-            self.engine.setProperty('rate', properties['rate'])
-            self.engine.setProperty('volume', properties['volume'])
+            synthesis = self.synthesis_properties(properties)
+            key = self._fetch_cached(segment_text, synthesis, seg_file)
+            if self.cache is None or key is not None:
+                self.engine_calls += 1
+                self.render_segment(segment_text, synthesis, seg_file)
+                if key is not None:
+                    self.cache.put(key, seg_file)
+            yield i, segment_text, properties, seg_file
+
+    def _render_parallel(self, segments, temp_dir, cancel=None):
+        """
+        Fans segments out to the worker pool and yields the results in segment order.
+        Segments are submitted from a feeder thread, so a segments iterator that blocks
+        (a story still being generated) does not hold back finished renders.
+        If the pool cannot be started or breaks (e.g. the engine cannot be created in a
+        worker process), the affected segments are rendered serially with self.engine.
+        Cache hits are resolved here and never reach the pool. When the consumer stops
+        early (a cancelled narration), renders that have not started are cancelled and
+        the ones already running are waited for, so none writes into temp_dir after the
+        caller discards it.
+        """
+        pending = queue.Queue()
+        errors = []
+        stopped = threading.Event()
+        submit_lock = threading.Lock()
+        submitted = []
+        pool = self._get_pool()
+
+        def submit_all():
             try:
-                self.engine.setProperty('pitch', properties['pitch'])
-            except Exception:
-                pass
-            self.engine.save_to_file(segment_text, seg_file)
-            self.engine.runAndWait()
-            seg_audio = AudioSegment.from_file(seg_file)
-            seg_duration = len(seg_audio)  # duration in ms
-            mapping.append({
-                "text": segment_text,
-                "start_time": current_time,
-                "end_time": current_time + seg_duration
-            })
-            current_time += seg_duration
-            segment_files.append(seg_file)
-            if properties['pause_after'] > 0:
-                silence = AudioSegment.silent(duration=properties['pause_after'])
-                silence_file = os.path.join(temp_dir, f"silence_{i}.wav")
-                silence.export(silence_file, format="wav")
-                segment_files.append(silence_file)
-                current_time += properties['pause_after']
-        final_audio = AudioSegment.empty()
-        for file in segment_files:
-            seg = AudioSegment.from_file(file)
-            final_audio += seg
-        final_file = os.path.join(temp_dir, "final_narration.wav")
-        final_audio.export(final_file, format="wav")
-        return final_file, mapping
+                for i, (segment_text, properties) in enumerate(segments):
+                    if stopped.is_set():
+                        break
+                    seg_file = os.path.join(temp_dir, f"segment_{i}.wav")
+                    synthesis = self.synthesis_properties(properties)
+                    key = self._fetch_cached(segment_text, synthesis, seg_file)
+                    cached = self.cache is not None and key is None
+                    future = None
+                    with submit_lock:
+                        if stopped.is_set():
+                            break
+                        if pool is not None and not cached:
+                            try:
+                                future = pool.submit(_render_in_worker, segment_text, synthesis, seg_file)
+                                submitted.append(future)
+                            except (BrokenProcessPool, RuntimeError):
+                                future = None
+                    pending.put((i, segment_text, properties, seg_file, key, cached, future))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                pending.put(None)
+
+        threading.Thread(target=submit_all, daemon=True).start()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                i, segment_text, properties, seg_file, key, rendered, future = item
+                check_cancelled(cancel, NarrationCancelled)
+                if future is not None:
+                    try:
+                        # Synthesis itself is traced in the worker process; this is the time spent waiting on it.
+                        with span("narrate.synthesize_wait", chars=len(segment_text)):
+                            while not wait([future], CANCEL_POLL_INTERVAL if cancel is not None else None).done:
+                                check_cancelled(cancel, NarrationCancelled)
+                            future.result()
+                        rendered = True
+                        self.engine_calls += 1
+                    except BrokenProcessPool:
+                        self._fall_back_to_serial()
+                if not rendered:
+                    self.engine_calls += 1
+                    self.render_segment(segment_text, self.synthesis_properties(properties), seg_file)
+                if key is not None:
+                    self.cache.put(key, seg_file)
+                yield i, segment_text, properties, seg_file
+        finally:
+            with submit_lock:
+                stopped.set()
+            for future in submitted:
+                future.cancel()
+            wait(submitted)
+        if errors:
+            raise errors[0]
+
+    def _get_pool(self):
+        if self.pool is None and self.workers > 1:
+            try:
+                # Spawned, not forked: the pool is started from a process that already runs
+                # threads (Qt, the Gemini client loop), and forking those can deadlock.
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_render_worker,
+                    initargs=(self.engine_factory,)
+                )
+            except (OSError, ValueError, NotImplementedError) as e:
+                warnings.warn(f"Parallel narration unavailable ({e}); rendering serially.")
+                self.workers = 1
+        return self.pool
+
+    def _fall_back_to_serial(self):
+        if self.workers > 1:
+            warnings.warn("TTS worker processes failed to start; rendering segments serially.")
+            self.workers = 1
+
+    def warm_up(self):
+        """
+        Starts the worker pool, if any, and waits until every worker has created its
+        engine, so the first story does not pay for process and engine startup.
+        """
+        pool = self._get_pool()
+        if pool is None:
+            return
+        try:
+            for future in [pool.submit(_ping_worker) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            self._fall_back_to_serial()
+
+    def close(self):
+        """Shuts down the worker pool, if one was started."""
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+_shared_narrator = None
+_shared_narrator_lock = threading.Lock()
+
+def get_shared_narrator():
+    """
+    The process-wide narrator, created on first use and then reused for every story,
+    so the engine is initialized and the voices enumerated only once.
+    """
+    global _shared_narrator
+    with _shared_narrator_lock:
+        if _shared_narrator is None:
+            _shared_narrator = VoiceNarrator()
+        return _shared_narrator
+
+class WavAssembler:
+    """
+    Streams narration audio into a single WAV file through one writer. Each segment
+    file is decoded exactly once and its frames are written straight through; pauses
+    are generated as zero-valued PCM frames in memory. Only one segment is held in
+    memory at a time, and the total cost is linear in the length of the story.
+    The output format is taken from the first segment; later segments that differ
+    (or are not plain PCM WAV) are converted with pydub.
+    """
+    default_params = (1, 2, 22050)  # channels, sample width, frame rate
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.params = None
+        self.bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_file(self, seg_file, effect=None, pause_before=0):
+        """
+        Appends the frames of seg_file, preceded by pause_before ms of silence, and
+        returns them (raw PCM bytes, without the silence). effect, if given, is
+        called as effect(frames, params) and returns the frames to write.
+        """
+        with span("narrate.decode"):
+            frames = self.read_frames(seg_file)
+        if effect is not None and dsp.supported(self.params):
+            with span("narrate.modulate", bytes=len(frames)):
+                frames = effect(frames, self.params)
+        with span("narrate.concatenate", bytes=len(frames)):
+            self._open()
+            if pause_before > 0:
+                # After decoding, so the output format comes from the first segment.
+                self._write(self.silence(pause_before))
+            self._write(frames)
+        return frames
+
+    def add_silence(self, duration_ms):
+        """Appends duration_ms of silence and returns the frames written."""
+        self._open()
+        frames = self.silence(duration_ms)
+        self._write(frames)
+        return frames
+
+    def silence(self, duration_ms):
+        """duration_ms of silence as frames in the output format (zero-valued; 128 for 8-bit)."""
+        channels, sample_width, frame_rate = self.params or self.default_params
+        count = int(frame_rate * duration_ms / 1000) * channels * sample_width
+        return b"\x80" * count if sample_width == 1 else bytes(count)
+
+    def duration_ms(self, frames):
+        channels, sample_width, frame_rate = self.params or self.default_params
+        return round(1000 * len(frames) / (channels * sample_width * frame_rate))
+
+    def position_ms(self, before=0):
+        """Time at the end of the audio written so far, or before its last `before` bytes."""
+        channels, sample_width, frame_rate = self.params or self.default_params
+        return round(1000 * (self.bytes_written - before) / (channels * sample_width * frame_rate))
+
+    def _write(self, frames):
+        self.writer.writeframesraw(frames)
+        self.bytes_written += len(frames)
+
+    def read_frames(self, seg_file):
+        """Decodes seg_file once into raw PCM frames in the output format."""
+        try:
+            with wave.open(seg_file, 'rb') as reader:
+                params = (reader.getnchannels(), reader.getsampwidth(), reader.getframerate())
+                if self.params is None:
+                    self.params = params
+                if params == self.params:
+                    return reader.readframes(reader.getnframes())
+        except (wave.Error, EOFError):
+            pass
+        audio = AudioSegment.from_file(seg_file)
+        if self.params is None:
+            self.params = (audio.channels, audio.sample_width, audio.frame_rate)
+        channels, sample_width, frame_rate = self.params
+        audio = audio.set_channels(channels).set_sample_width(sample_width).set_frame_rate(frame_rate)
+        return audio.raw_data
+
+    def write_copy(self, path, frames):
+        """Writes frames to a separate WAV file in the output format."""
+        channels, sample_width, frame_rate = self.params or self.default_params
+        with wave.open(path, 'wb') as writer:
+            writer.setnchannels(channels)
+            writer.setsampwidth(sample_width)
+            writer.setframerate(frame_rate)
+            writer.writeframes(frames)
+
+    def _open(self):
+        if self.writer is None:
+            if self.params is None:
+                self.params = self.default_params
+            channels, sample_width, frame_rate = self.params
+            self.writer = wave.open(self.path, 'wb')
+            self.writer.setnchannels(channels)
+            self.writer.setsampwidth(sample_width)
+            self.writer.setframerate(frame_rate)
+
+    def close(self):
+        with span("narrate.export"):
+            self._open()  # an empty narration still produces a valid (silent) file
+            self.writer.close()
+
+# Each pool process owns one narrator (and therefore one engine), created once.
+_worker_narrator = None
+
+def _init_render_worker(engine_factory):
+    global _worker_narrator
+    # The parent process consults and fills the cache and applies any DSP modulation,
+    # so workers only synthesize, with the properties they are given.
+    _worker_narrator = VoiceNarrator(engine_factory=engine_factory, workers=1, cache=False, workspace=False,
+                                     modulation="engine")
+
+def _ping_worker():
+    return _worker_narrator is not None
+
+def _render_in_worker(segment_text, properties, seg_file):
+    return _worker_narrator.render_segment(segment_text, properties, seg_file)
 
 if __name__ == "__main__":
     # For testing purposes.
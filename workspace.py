@@ -0,0 +1,195 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import warnings
+from pydub import AudioSegment
+from tracing import span
+
+DEFAULT_WORKSPACE_DIR = os.getenv(
+    "NARRATOR_WORKSPACE_DIR", os.path.join(tempfile.gettempdir(), "ai_dungeon_narrations")
+)
+DEFAULT_WORKSPACE_MB = int(os.getenv("NARRATOR_WORKSPACE_MB", "512"))
+DEFAULT_OUTPUT_FORMAT = os.getenv("NARRATOR_OUTPUT_FORMAT", "wav")
+# pydub export arguments per compressed format (encoded by ffmpeg).
+EXPORT_FORMATS = {
+    "flac": {},
+    "mp3": {"bitrate": "64k"},
+    "ogg": {"codec": "libvorbis", "bitrate": "48k"},
+    "opus": {"codec": "libopus", "bitrate": "32k"},
+}
+# Present while a story directory is being written; such directories are never evicted
+# (unless the marker is older than STALE_SECONDS, i.e. the process writing it died).
+IN_PROGRESS = ".in-progress"
+STALE_SECONDS = 24 * 3600
+
+class Workspace:
+    """
+    Owns the directories narrations are rendered in. Each story gets its own
+    directory from create(); finish() deletes the intermediate segment files once the
+    final narration is assembled, optionally re-encodes it to a compressed format,
+    and evicts the oldest finished narrations until the workspace fits in max_bytes
+    (0 means no quota). Directories of other stories in progress, from this or any
+    other process, are left alone.
+
+    finish() reports the bytes written for the story (cache hits linked in from
+    the segment cache are not counted) and the bytes still kept on disk
+    afterwards; totals across stories are available from stats().
+    """
+    def __init__(self, directory=DEFAULT_WORKSPACE_DIR, max_bytes=DEFAULT_WORKSPACE_MB * 1024 * 1024,
+                 output_format=DEFAULT_OUTPUT_FORMAT):
+        if output_format != "wav" and output_format not in EXPORT_FORMATS:
+            raise ValueError(f"Error: unsupported output format '{output_format}'.")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.output_format = output_format
+        self.stories = 0
+        self.bytes_written = 0
+        self.bytes_kept = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls()
+
+    def create(self):
+        """Returns a new, empty directory for one story's narration."""
+        story_dir = tempfile.mkdtemp(prefix="story-", dir=self.directory)
+        open(os.path.join(story_dir, IN_PROGRESS), "w").close()
+        return story_dir
+
+    def finish(self, story_dir, final_file, keep_intermediates=False):
+        """
+        Finalizes a story directory. Intermediate files are deleted unless
+        keep_intermediates is set (progressive playback still needs them; see
+        release()). Returns the path of the stored narration and a usage dict with
+        'bytes_written' and 'bytes_kept'.
+        """
+        # Segments hard-linked from the segment cache were not written for this story.
+        written = directory_size(story_dir, count_links=False)
+        if not keep_intermediates:
+            self._remove_except(story_dir, final_file)
+        if self.output_format != "wav":
+            compressed = self.compress(final_file)
+            if compressed != final_file:
+                written += os.path.getsize(compressed)
+                os.unlink(final_file)
+                final_file = compressed
+        try:
+            os.unlink(os.path.join(story_dir, IN_PROGRESS))
+        except FileNotFoundError:
+            pass
+        kept = directory_size(story_dir)
+        with self.lock:
+            self.stories += 1
+            self.bytes_written += written
+            self.bytes_kept += kept
+        self.enforce_quota(exclude=story_dir)
+        return final_file, {"bytes_written": written, "bytes_kept": kept}
+
+    def compress(self, wav_file):
+        """Re-encodes wav_file in the output format; returns wav_file itself if that fails."""
+        path = os.path.splitext(wav_file)[0] + "." + self.output_format
+        with span("narrate.compress", format=self.output_format):
+            try:
+                AudioSegment.from_wav(wav_file).export(path, format=self.output_format,
+                                                       **EXPORT_FORMATS[self.output_format])
+            except Exception as e:
+                warnings.warn(f"Could not encode the narration as {self.output_format} ({e}); keeping WAV.")
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                return wav_file
+        return path
+
+    def release(self, final_file):
+        """Deletes what is left of a story's intermediate files, keeping only final_file."""
+        self._remove_except(os.path.dirname(final_file), final_file)
+
+    def discard(self, story_dir):
+        """Deletes a story directory, including its final narration."""
+        shutil.rmtree(story_dir, ignore_errors=True)
+
+    def enforce_quota(self, exclude=None):
+        """Evicts the oldest finished narrations until the workspace fits in max_bytes."""
+        if self.max_bytes <= 0:
+            return
+        stories = []
+        total = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_dir() or not entry.name.startswith("story-"):
+                    continue
+                size = directory_size(entry.path)
+                total += size
+                if entry.path == exclude:
+                    continue
+                try:
+                    marker = os.stat(os.path.join(entry.path, IN_PROGRESS))
+                    if now - marker.st_mtime < STALE_SECONDS:
+                        continue
+                except FileNotFoundError:
+                    pass
+                try:
+                    stories.append((entry.stat().st_mtime, entry.path, size))
+                except FileNotFoundError:
+                    continue
+        stories.sort()
+        for _, path, size in stories:
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+            with self.lock:
+                self.evicted += 1
+
+    def stats(self):
+        return {"stories": self.stories, "bytes_written": self.bytes_written,
+                "bytes_kept": self.bytes_kept, "evicted": self.evicted}
+
+    @staticmethod
+    def _remove_except(story_dir, keep):
+        with os.scandir(story_dir) as it:
+            for entry in it:
+                if entry.path == keep or entry.name == IN_PROGRESS:
+                    continue
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass  # already gone, or still open elsewhere (e.g. by the media player on Windows)
+
+def directory_size(path, count_links=True):
+    """
+    Total size of the files in path. With count_links=False, files that have other
+    hard links (segments linked from the segment cache) are left out.
+    """
+    total = 0
+    try:
+        it = os.scandir(path)
+    except FileNotFoundError:
+        return 0  # deleted meanwhile, e.g. a story another process finished with
+    with it:
+        for entry in it:
+            try:
+                if count_links:
+                    total += entry.stat().st_size
+                    continue
+                # DirEntry.stat() has no link count on Windows; os.stat() does.
+                stat = os.stat(entry.path)
+                if stat.st_nlink <= 1:
+                    total += stat.st_size
+            except FileNotFoundError:
+                continue
+    return total
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"